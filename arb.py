@@ -9,13 +9,47 @@ SEMI-AUTOMATED Arbitrage Finder - Real-Time Edition (Replit Version)
 - Flask keep-alive for 24/7 operation on Replit
 """
 
-from flask import Flask
-from threading import Thread
+from flask import Flask, Response, request
+from threading import Thread, Lock, Event, get_ident, main_thread
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import requests
+from requests.adapters import HTTPAdapter
 import time
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Iterator, Iterable, Tuple
 import json
+import re
+import codecs
+import sqlite3
+import struct
+import mmap
+import os
+import signal
+import sys
+import multiprocessing
+import itertools
+import math
+import random
+import unicodedata
+import tracemalloc
+import linecache
+import inspect
+import hmac
+from dis import findlinestarts
+from types import CodeType
+from bisect import bisect_left
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+from functools import lru_cache
+from queue import PriorityQueue, Queue, Empty, Full
+
+try:
+    import numpy as np
+except ImportError:  # Falls back to the pure-Python scanner
+    np = None
 
 # ============================================================================
 # FLASK KEEP-ALIVE (for Replit)
@@ -38,14 +72,42 @@ def home():
         <p>🔍 Searches performed: {stats.get('searches', 0)}</p>
         <p>🎯 Opportunities found: {stats.get('opportunities_found', 0)}</p>
         <p>📡 API calls made: {stats.get('api_calls', 0)}</p>
+        <p>📈 <a href="/metrics" style="color: #00ff00;">Prometheus metrics</a></p>
+        <p>📺 <a href="/stream" style="color: #00ff00;">Live opportunity stream</a> (Server-Sent Events)</p>
         <hr>
         <p style="color: #888;">Keep this URL alive with UptimeRobot for 24/7 monitoring</p>
     </body>
     </html>
     """
 
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stream')
+def stream_page():
+    # EventSource sends Last-Event-ID on reconnect; the query parameter covers the first connect
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    return Response(live_stream.events(last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def profile_page():
+    # POST starts profiling the next ?cycles=N cycles; GET shows progress and the last report
+    token = request.headers.get('X-Admin-Token') or request.args.get('token') or ''
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return Response("Forbidden\n", status=403, mimetype='text/plain')
+    if request.method == 'POST':
+        cycles = profiler.request(request.args.get('cycles', PROFILE_CYCLES, type=int))
+        return Response(f"Profiling the next {cycles} cycle(s) plus one traced cycle\n", mimetype='text/plain')
+    return Response(profiler.status(), mimetype='text/plain')
+
 def run_flask():
-    app.run(host='0.0.0.0', port=8080)
+    app.run(host='0.0.0.0', port=8080, threaded=True)
 
 def keep_alive():
     t = Thread(target=run_flask)
@@ -63,10 +125,55 @@ TELEGRAM_CHAT_ID = "1899667197"
 # Check odds every 5 minutes (real-time!)
 CHECK_INTERVAL = 300  # seconds
 
+# Adaptive polling: per-sport intervals are derived from the remaining API
+# quota, events near kickoff and recent odds movement, within these bounds
+MIN_POLL_INTERVAL = 60      # seconds
+MAX_POLL_INTERVAL = 1800    # seconds
+KICKOFF_WINDOW = 3 * 3600   # events starting within this many seconds count as "near kickoff"
+VOLATILITY_SMOOTHING = 0.3  # weight of the latest poll in the changed-events average
+QUOTA_RESET_DAY = 1         # day of month (1-28) the Odds API quota resets
+
+# Odds API request shape (each poll costs regions x markets credits)
+ODDS_REGIONS = 'uk,eu'
+ODDS_MARKETS = 'h2h,totals,spreads'
+
 # Settings
 MIN_PROFIT_PERCENT = 2.0
 MAX_STAKE_KES = 1000
 
+# Stake sizing across a cycle's arbs: one shared bankroll, per-bookmaker
+# balances, and bets in whole increments the bookmakers accept
+BANKROLL_KES = 5000              # shared by every arb alerted in one polling cycle
+BOOKMAKER_BALANCES = {}          # bookmaker key -> KES available there (missing = no limit)
+STAKE_INCREMENT = 10             # KES; every bet is a multiple of this (and at least this)
+BOOKMAKER_STAKE_INCREMENTS = {}  # bookmaker key -> its own increment
+ALLOCATION_WINDOW = 2            # seconds after a cycle's first results before its arbs are staked;
+                                 # sports arriving later are funded from what is left
+
+# Quotes whose (market or bookmaker) last_update is older than this at scan
+# time are ignored, so a fresh price is never paired with a stale one (0 = off)
+MAX_QUOTE_AGE = 300  # seconds
+
+# Scan whole sports at once with NumPy (pure-Python loop if numpy is missing)
+USE_NUMPY_SCANNER = True
+
+# Max sports fetched in parallel (also the size of the keep-alive pool)
+FETCH_CONCURRENCY = 5
+
+# Fetch resilience: a slow sport gets a duplicate (hedged) request once it runs
+# past its observed p95, failures retry with jittered backoff inside the cycle's
+# deadline, and a sport that keeps failing is skipped for a while. Until a sport
+# fetches again, its last good odds are used.
+FETCH_DEADLINE = 20          # seconds per polling cycle, retries and hedges included
+FETCH_RETRIES = 2            # extra attempts after a failed fetch
+RETRY_BACKOFF = 0.5          # seconds, doubled per retry and jittered +/-50%
+HEDGE_PERCENTILE = 95        # hedge once a fetch is slower than this percentile
+HEDGE_MIN_SAMPLES = 20       # latencies a sport needs before it is ever hedged
+HEDGE_MIN_DELAY = 1.0        # seconds; never hedge sooner than this
+HEDGE_BUDGET = 0.1           # max share of fetches that may be hedged (each costs quota)
+BREAKER_FAILURES = 3         # consecutive failed fetches that trip a sport's breaker
+BREAKER_COOLDOWN = 600       # seconds a tripped sport is skipped before a trial fetch
+
 # Active hours (Kenya time - 24hr format)
 ACTIVE_START_HOUR = 6   # 6 AM
 ACTIVE_END_HOUR = 23    # 11 PM
@@ -90,6 +197,54 @@ KENYAN_BOOKMAKERS = [
     'bet254', 'mozzartbet', 'betika', 'odibets', 'shabiki'
 ]
 
+# Near-arb hot set: events whose best implied-probability sum is under
+# 1 + HOT_MARGIN are re-polled one by one through the per-event odds endpoint
+# between full sport polls (single-process mode only)
+HOT_MARGIN = 0.02        # implied sums of 1.00-1.02 count as "nearly an arb"
+HOT_SET_SIZE = 10        # events tracked, closest to an arb first (0 = off)
+HOT_POLL_INTERVAL = 30   # seconds; the fastest a hot round can repeat
+HOT_QUOTA_SHARE = 0.25   # share of the API quota hot polling may spend
+
+# Sharded scanning: poll every in-season sport from /sports, spread over this
+# many worker processes (0 = single process with DAILY_SPORTS)
+SCAN_WORKERS = 0
+SPORT_TIMEOUT = 90               # seconds before a stuck sport's worker is replaced
+SPORTS_REFRESH_INTERVAL = 3600   # seconds between /sports lookups (they cost no quota)
+
+# Telegram allows about one message per second per chat
+TELEGRAM_RATE_PER_SEC = 1.0
+TELEGRAM_BURST = 3
+
+# Extra odds feeds merged into the Odds API book, fixture by fixture. Each feed
+# returns Odds API-shaped events (home_team, away_team, commence_time, bookmakers):
+#   {'type': 'file', 'name': 'local', 'path': 'feeds/{sport}.json'}
+#   {'type': 'http', 'name': 'scraper', 'url': 'http://localhost:8080/odds/{sport}', 'headers': {}}
+ODDS_PROVIDERS = []
+MATCH_WINDOW = 3 * 3600  # seconds two feeds' kickoff times may differ by for one fixture
+
+# Odds history: every fetched payload is appended here (None to disable)
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_FLUSH_INTERVAL = 5  # seconds between batched writes
+
+# Live opportunity stream at /stream (Server-Sent Events)
+SSE_BUFFER_SIZE = 1000   # recent events kept for Last-Event-ID resume
+SSE_QUEUE_SIZE = 256     # events a client may fall behind before it is cut off
+SSE_HEARTBEAT = 15       # seconds between keep-alive comments
+
+# On-demand profiling: POST /admin/profile?cycles=N (token in X-Admin-Token or
+# ?token=) or `kill -USR1 <pid>` samples CPU for the next N polling cycles,
+# traces allocations for one more, then writes a per-stage report to PROFILE_DIR
+ADMIN_TOKEN = ""                 # admin endpoints refuse every request while empty
+PROFILE_CYCLES = 3               # cycles profiled per SIGUSR1 (or POST without ?cycles=)
+PROFILE_MAX_CYCLES = 20          # cap on ?cycles= and on a run extended by repeated requests
+PROFILE_DIR = "profiles"
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_TRACE_FRAMES = 10        # stack depth tracemalloc keeps per allocation (deeper = slower traced cycle)
+PROFILE_TOP = 15                 # functions / allocation sites listed per stage
+
+# Bytes read per step while streaming an odds payload
+STREAM_CHUNK_SIZE = 64 * 1024
+
 # Bookmaker URLs (for quick links)
 BOOKMAKER_URLS = {
     'betway': 'https://betway.co.ke',
@@ -103,70 +258,2091 @@ BOOKMAKER_URLS = {
     'odibets': 'https://odibets.com',
 }
 
-# Track found opportunities (avoid duplicate alerts)
-seen_opportunities = set()
+# Duplicate-alert suppression (survives restarts via SQLite)
+DEDUPE_DB_PATH = "seen_opportunities.db"
+DEDUPE_MAX_ENTRIES = 5000
+DEDUPE_TTL = 24 * 3600      # seconds; entries also expire at kickoff
+MIN_PROFIT_CHANGE = 0.5     # re-alert an arb only if profit moved by this many points
+
+# Statistics
+stats = {
+    'searches': 0,
+    'opportunities_found': 0,
+    'api_calls': 0,
+    'started_at': datetime.now()
+}
+stats_lock = Lock()
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+# Histogram buckets (seconds) for stage latencies
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Buckets (seconds) for quote ages and time-to-alert, which run to minutes
+AGE_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+
+# Histograms that don't use LATENCY_BUCKETS
+HISTOGRAM_BUCKETS = {
+    'arb_quote_age_seconds': AGE_BUCKETS,
+    'arb_quote_to_fetch_seconds': AGE_BUCKETS,
+    'arb_time_to_alert_seconds': AGE_BUCKETS,
+}
+
+METRIC_HELP = {
+    'arb_searches_total': "Polling cycles started",
+    'arb_opportunities_found_total': "Opportunities that passed dedupe",
+    'arb_api_calls_total': "Successful Odds API requests",
+    'arb_fetch_errors_total': "Failed Odds API requests",
+    'arb_fetch_seconds': "HTTP time per odds request (headers + body)",
+    'arb_decode_seconds': "JSON decode time per odds payload",
+    'arb_filter_seconds': "Bookmaker filtering time per odds payload",
+    'arb_scan_seconds': "Arbitrage scan time per sport",
+    'arb_format_seconds': "Alert message formatting time",
+    'arb_telegram_send_seconds': "Telegram sendMessage round trip",
+    'arb_cycle_seconds': "Wall-clock time of a polling cycle",
+    'arb_api_quota_remaining': "x-requests-remaining from the latest Odds API response",
+    'arb_api_quota_used': "x-requests-used from the latest Odds API response",
+    'arb_alert_queue_depth': "Alerts waiting in the dispatcher queue",
+    'arb_alerts_sent_total': "Telegram alerts delivered",
+    'arb_alerts_failed_total': "Telegram alerts given up on",
+    'arb_snapshot_records_total': "Quotes appended to the odds history",
+    'arb_snapshots_dropped_total': "Payloads dropped because the snapshot writer fell behind",
+    'arb_shard_task_seconds': "Time from handing a sport to a worker process to its result",
+    'arb_shard_busy_workers': "Worker processes currently scanning a sport",
+    'arb_stream_subscribers': "Clients connected to /stream",
+    'arb_stream_events_total': "Events published to /stream",
+    'arb_stream_dropped_subscribers_total': "/stream clients cut off for falling behind",
+    'arb_sport_timeouts_total': "Sports whose worker overran SPORT_TIMEOUT and was replaced",
+    'arb_fetch_retries_total': "Odds API requests retried after a failure",
+    'arb_fetch_hedges_total': "Duplicate odds requests sent for a fetch slower than its p95",
+    'arb_fetch_hedge_wins_total': "Hedged fetches where the duplicate answered first",
+    'arb_fetch_fallbacks_total': "Fetches answered from the sport's last good odds",
+    'arb_breaker_open': "1 while a sport's circuit breaker is skipping it",
+    'arb_provider_fetch_seconds': "Time to load one sport from an extra odds provider",
+    'arb_provider_errors_total': "Extra odds provider loads that failed (last good events used)",
+    'arb_provider_events_total': "Extra provider events, by whether they matched an existing fixture",
+    'arb_match_seconds': "Time to match and merge extra provider events into a sport's book",
+    'arb_hot_events': "Events in the near-arb hot set",
+    'arb_hot_polls_total': "Single-event odds requests made for the hot set",
+    'arb_stale_quotes_total': "Quotes left out of a scan for being older than MAX_QUOTE_AGE",
+    'arb_quote_age_seconds': "Age of an opportunity's oldest price when it was scanned",
+    'arb_quote_to_fetch_seconds': "From the newest price in an alerted opportunity changing to its fetch",
+    'arb_fetch_to_scan_seconds': "From fetching an alerted opportunity's odds to scanning them",
+    'arb_scan_to_send_seconds': "From scanning an opportunity to its Telegram alert going out",
+    'arb_time_to_alert_seconds': "From the newest price in an opportunity changing to its Telegram alert",
+}
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and latency histograms,
+    rendered in the Prometheus text exposition format at /metrics.
+    """
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = Lock()
+        self.kinds = {}       # name -> 'counter' | 'gauge' | 'histogram'
+        self.values = {}      # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+    
+    @staticmethod
+    def _labels(labels: Dict) -> Tuple:
+        return tuple(sorted(labels.items()))
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, self._labels(labels))
+        with self.lock:
+            self.kinds.setdefault(name, 'counter')
+            self.values[key] = self.values.get(key, 0) + amount
+    
+    def set(self, name: str, value: float, **labels):
+        key = (name, self._labels(labels))
+        with self.lock:
+            self.kinds.setdefault(name, 'gauge')
+            self.values[key] = value
+    
+    def _buckets(self, name: str) -> Tuple[float, ...]:
+        return HISTOGRAM_BUCKETS.get(name, self.buckets)
+    
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, self._labels(labels))
+        buckets = self._buckets(name)
+        index = bisect_left(buckets, seconds)
+        with self.lock:
+            self.kinds.setdefault(name, 'histogram')
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+    
+    def drain(self) -> Tuple[Dict, Dict, Dict]:
+        """Hand over everything recorded so far and start empty (worker processes ship this)"""
+        with self.lock:
+            drained = (self.kinds, self.values, self.histograms)
+            self.kinds, self.values, self.histograms = {}, {}, {}
+        return drained
+    
+    def merge(self, kinds: Dict, values: Dict, histograms: Dict):
+        """Fold in another process's drained metrics: counters and histograms add, gauges overwrite"""
+        with self.lock:
+            for name, kind in kinds.items():
+                self.kinds.setdefault(name, kind)
+            for key, value in values.items():
+                if kinds[key[0]] == 'counter':
+                    self.values[key] = self.values.get(key, 0) + value
+                else:
+                    self.values[key] = value
+            for key, histogram in histograms.items():
+                mine = self.histograms.get(key)
+                self.histograms[key] = list(histogram) if mine is None else [a + b for a, b in zip(mine, histogram)]
+    
+    @contextmanager
+    def time(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    @staticmethod
+    def _format_labels(labels: Tuple, extra: str = '') -> str:
+        parts = []
+        for key, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{key}="{value}"')
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+    
+    def render(self) -> str:
+        with self.lock:
+            kinds = dict(self.kinds)
+            values = dict(self.values)
+            histograms = {key: list(h) for key, h in self.histograms.items()}
+        
+        lines = []
+        for name in sorted(kinds):
+            kind = kinds[name]
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+            
+            if kind == 'histogram':
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self._buckets(name) + (float('inf'),), histogram):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                        bucket_labels = self._format_labels(labels, 'le="' + le + '"')
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {histogram[-2]:.6f}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {histogram[-1]}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+        
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def bump_stat(key: str, amount: int = 1):
+    """Thread-safe update of the daily `stats` counters (mirrored as Prometheus counters)"""
+    with stats_lock:
+        stats[key] += amount
+    metrics.inc(f"arb_{key}_total", amount)
+
+# ============================================================================
+# PROFILING
+# ============================================================================
+
+# Functions whose time and allocations are reported as a stage (innermost wins)
+PROFILE_STAGES = {
+    'ArbitrageFinder.fetch_once': 'fetch',
+    'ArbitrageFinder.fetch_once.chunks': 'fetch',
+    'ArbitrageFinder.get_event_odds': 'fetch',
+    'OddsProvider.fetch': 'fetch',
+    'OddsStreamParser.iter_events': 'decode',
+    'merge_feeds': 'merge',
+    'OddsCache.update': 'diff',
+    'OddsCache.update_event': 'diff',
+    'EventQuotes.from_api': 'model',
+    'ArbitrageFinder.find_arbs': 'scan',
+    'scan_batch': 'scan',
+    'HotSet.update': 'hot set',
+    'ArbitrageFinder.build_opportunity': 'build',
+    'OpportunityStream.track': 'stream',
+    'ArbitrageFinder.accept': 'dedupe',
+    'StakeAllocator.allocate': 'allocate',
+    'TelegramNotifier.format_opportunity': 'alert',
+    'TelegramNotifier.deliver': 'alert',
+    'SnapshotRecorder._write': 'snapshot',
+    'Profiler._sample': None,  # the profiler's own bookkeeping is left out
+    'Profiler.cycle_started': None,
+    'Profiler.cycle_finished': None,
+}
+
+
+def _resolve_code(dotted: str) -> CodeType:
+    """'Class.method.nested' in this module -> its code object"""
+    parts = dotted.split('.')
+    target = globals()[parts[0]]
+    for part in parts[1:]:
+        if isinstance(target, CodeType):
+            target = next(c for c in target.co_consts if isinstance(c, CodeType) and c.co_name == part)
+        else:
+            target = inspect.getattr_static(target, part)
+            target = getattr(target, '__func__', target)
+            target = getattr(target, '__code__', target)
+    return getattr(target, '__code__', target)
+
+
+def _code_label(code: CodeType) -> str:
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Profiles the next N polling cycles on request. During those cycles a
+    sampling thread reads every thread's stack each PROFILE_SAMPLE_INTERVAL
+    and charges it to the innermost PROFILE_STAGES function. One extra cycle
+    then runs under tracemalloc (it is several times slower, so it is kept
+    out of the CPU samples) and the blocks it leaves alive are charged to
+    stages the same way. When off, the per-cycle hooks only check attributes.
+    """
+    
+    def __init__(self, directory: str = PROFILE_DIR, interval: float = PROFILE_SAMPLE_INTERVAL,
+                 frames: int = PROFILE_TRACE_FRAMES, top: int = PROFILE_TOP):
+        self.directory = directory
+        self.interval = interval
+        self.frames = frames
+        self.top = top
+        self.requested = 0  # plain int: set from signal handlers and Flask threads
+        self.active = False
+        self.in_cycle = False
+        self.last_path = None
+        self.last_report = None
+    
+    def request(self, cycles: int = PROFILE_CYCLES) -> int:
+        self.requested = min(max(1, int(cycles)), PROFILE_MAX_CYCLES)
+        return self.requested
+    
+    def status(self) -> str:
+        if self.active:
+            head = f"Profiling: {self.cycles_done} cycle(s) done, {self.cycles_left} to go\n"
+        elif self.requested:
+            head = f"Profiling starts with the next cycle ({self.requested} cycle(s) plus one traced)\n"
+        else:
+            head = "Profiler idle\n"
+        if self.last_report:
+            head += f"\nLast report ({self.last_path}):\n\n{self.last_report}"
+        return head
+    
+    def cycle_started(self):
+        if not self.active:
+            if not self.requested:
+                return
+            self._start()
+        
+        # A request made mid-run extends it, up to PROFILE_MAX_CYCLES sampled cycles plus the traced one
+        self.cycles_left = min(self.cycles_left + self.requested, PROFILE_MAX_CYCLES + 1 - self.cycles_done)
+        self.requested = 0
+        self.tracing = self.cycles_left == 1
+        if self.tracing:
+            # Tracing from the cycle start means the end snapshot holds only this
+            # cycle's surviving blocks; an outside tracer gets a baseline diff instead
+            self.baseline = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            if self.baseline is None:
+                tracemalloc.start(self.frames)
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        else:
+            self.sampling.set()
+        self.cycle_start = time.perf_counter()
+        self.in_cycle = True
+    
+    def cycle_finished(self):
+        if not self.in_cycle:
+            return
+        self.in_cycle = False
+        seconds = time.perf_counter() - self.cycle_start
+        if self.tracing:
+            snapshot = tracemalloc.take_snapshot()
+            self.traced_seconds, self.peak = seconds, tracemalloc.get_traced_memory()[1]
+            if self.baseline is None:
+                tracemalloc.stop()
+                self._charge_allocations(snapshot.statistics('traceback'))
+            else:
+                self._charge_allocations(snapshot.compare_to(self.baseline, 'traceback'))
+            self.baseline = None
+        else:
+            self.sampling.clear()
+            self.cycle_seconds.append(seconds)
+            self.cycles_done += 1
+        
+        self.cycles_left -= 1
+        if self.cycles_left <= 0:
+            self._finish()
+    
+    def _start(self):
+        self.stage_codes = {}
+        ranges = []
+        for dotted, stage in PROFILE_STAGES.items():
+            code = _resolve_code(dotted)
+            self.stage_codes[code] = stage
+            lines = [line for _, line in findlinestarts(code) if line]
+            ranges.append((max(lines) - code.co_firstlineno, code.co_firstlineno, max(lines), stage))
+        self.ranges = sorted(ranges)  # narrowest first, so nested functions win
+        self.source_file = _resolve_code('Profiler._sample').co_filename
+        
+        self.stage_samples = Counter()
+        self.self_samples = Counter()  # (stage, code) -> samples with code on top of the stack
+        self.cum_samples = Counter()   # (stage, code) -> samples with code anywhere on the stack
+        self.alloc_size = Counter()    # (stage, filename, lineno) -> bytes kept
+        self.alloc_count = Counter()
+        self.cycle_seconds = []
+        self.traced_seconds = self.peak = None
+        self.cycles_done = 0
+        self.cycles_left = 1  # the traced cycle; cycle_started adds the sampled ones
+        self.started_at = datetime.now()
+        
+        self.sampling = Event()
+        self.stopping = Event()
+        self.sampler = Thread(target=self._sample, daemon=True)
+        self.sampler.start()
+        self.active = True
+        print(f"🩺 Profiling the next {self.requested} cycle(s) plus one traced cycle")
+    
+    def _finish(self):
+        self.stopping.set()
+        self.sampler.join()
+        self.active = False
+        
+        self.last_report = self.report()
+        os.makedirs(self.directory, exist_ok=True)
+        self.last_path = os.path.join(self.directory, f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt")
+        with open(self.last_path, 'w', encoding='utf-8') as f:
+            f.write(self.last_report)
+        print(f"🩺 Profile of {self.cycles_done} cycle(s) written to {self.last_path}")
+    
+    def _sample(self):
+        me = get_ident()
+        main = main_thread().ident
+        while not self.stopping.is_set():
+            if not self.sampling.wait(0.1):
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                leaf = frame.f_code
+                stage = None
+                on_stack = set()
+                while frame is not None:
+                    code = frame.f_code
+                    if stage is None:
+                        stage = self.stage_codes.get(code)
+                    on_stack.add(code)
+                    frame = frame.f_back
+                if stage is None:
+                    if thread_id != main:
+                        continue  # Idle pool / Flask threads
+                    stage = 'loop'
+                self.stage_samples[stage] += 1
+                self.self_samples[(stage, leaf)] += 1
+                for code in on_stack:
+                    self.cum_samples[(stage, code)] += 1
+            time.sleep(self.interval)
+    
+    def _stage_of(self, traceback: tracemalloc.Traceback) -> Optional[str]:
+        for frame in reversed(traceback):  # most recent call first
+            if frame.filename != self.source_file:
+                continue
+            for _, first, last, stage in self.ranges:
+                if first <= frame.lineno <= last:
+                    return stage
+        return 'other'
+    
+    def _charge_allocations(self, statistics: list):
+        for stat in statistics:
+            size, count = getattr(stat, 'size_diff', stat.size), getattr(stat, 'count_diff', stat.count)
+            if size <= 0:
+                continue
+            stage = self._stage_of(stat.traceback)
+            if stage is None:
+                continue
+            site = stat.traceback[-1]
+            self.alloc_size[(stage, site.filename, site.lineno)] += size
+            self.alloc_count[(stage, site.filename, site.lineno)] += count
+    
+    def report(self) -> str:
+        total = sum(self.stage_samples.values()) or 1
+        lines = [
+            f"Arbitrage monitor profile: {self.cycles_done} cycle(s), "
+            f"{self.started_at:%Y-%m-%d %H:%M:%S} - {datetime.now():%H:%M:%S}",
+            "Sampled cycle seconds: " + ", ".join(f"{s:.2f}" for s in self.cycle_seconds),
+            f"Traced cycle: {self.traced_seconds:.2f} s (slowed by tracemalloc), "
+            f"peak traced memory {self.peak / 2**20:.1f} MiB",
+            "",
+            f"CPU: wall-clock stack samples every {self.interval * 1000:g} ms across threads, "
+            f"charged to the innermost stage on the stack ('loop' = monitor thread elsewhere, incl. waiting)",
+        ]
+        for stage, count in self.stage_samples.most_common():
+            lines += ["", f"[{stage}] {count} samples ({count / total:.1%})", "      self       cum  function"]
+            top = sorted(((c, code) for (s, code), c in self.self_samples.items() if s == stage),
+                         key=lambda item: -item[0])[:self.top]
+            for samples, code in top:
+                lines.append(f"  {samples:8d}  {self.cum_samples[(stage, code)]:8d}  {_code_label(code)}")
+        
+        lines += ["", "Memory: bytes allocated during the traced cycle and still alive at its end, by stage"]
+        stage_bytes = Counter()
+        for (stage, _, _), size in self.alloc_size.items():
+            stage_bytes[stage] += size
+        for stage, size in stage_bytes.most_common():
+            lines += ["", f"[{stage}] {size / 1024:+.1f} KiB"]
+            top = sorted(((c, key) for key, c in self.alloc_size.items() if key[0] == stage),
+                         key=lambda item: -item[0])[:self.top]
+            for size, (_, filename, lineno) in top:
+                source = linecache.getline(filename, lineno).strip()
+                lines.append(f"  {size / 1024:+10.1f} KiB {self.alloc_count[(stage, filename, lineno)]:+8d} blocks  "
+                             f"{os.path.basename(filename)}:{lineno}  {source}")
+        return "\n".join(lines) + "\n"
+
+
+profiler = Profiler()
+
+# ============================================================================
+# ODDS CACHE
+# ============================================================================
+
+def parse_api_time(value: Optional[str]) -> Optional[float]:
+    """Odds API ISO timestamp ('2024-01-01T12:00:00Z') -> unix seconds"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def format_api_time(timestamp: float) -> str:
+    """unix seconds -> Odds API ISO timestamp"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class OddsCache:
+    """
+    Per-event / per-bookmaker odds cache.
+    Each payload is diffed against the previous one so only events whose
+    quotes moved are rescanned. Started events are dropped.
+    """
+    
+    def __init__(self):
+        # event_id -> {'sport', 'commence_ts', 'stamps': {bookmaker_key: stamp}, 'event': EventQuotes}
+        self.events = {}
+        # sport -> (changed events, total events) in the latest payload
+        self.activity = {}
+    
+    @staticmethod
+    def event_id(event: Dict) -> str:
+        return event.get('id', f"{event['home_team']}_{event['away_team']}")
+    
+    @staticmethod
+    def bookmaker_stamp(bookmaker: Dict):
+        # last_update moves whenever any of the bookmaker's prices move;
+        # fall back to the prices themselves if a feed doesn't send it
+        return bookmaker.get('last_update') or repr(bookmaker.get('markets'))
+    
+    def update(self, sport: str, events: List[Dict], now: Optional[float] = None) -> List['EventQuotes']:
+        """Store a fresh payload for a sport and return only the changed events, as quote tables"""
+        now = time.time() if now is None else now
+        changed = []
+        current_ids = set()
+        
+        for event in events:
+            event_id, quotes = self._store(sport, event, now)
+            if event_id is None:
+                continue
+            current_ids.add(event_id)
+            if quotes is not None:
+                changed.append(quotes)
+        
+        # Forget events that left this sport's feed
+        for event_id in [eid for eid, entry in self.events.items()
+                         if entry['sport'] == sport and eid not in current_ids]:
+            del self.events[event_id]
+        
+        self.activity[sport] = (len(changed), len(current_ids))
+        self.prune(now)
+        return changed
+    
+    def update_event(self, sport: str, event: Dict, now: Optional[float] = None) -> Optional['EventQuotes']:
+        """Store one event fetched on its own (e.g. a hot-set poll); its quote table if it moved"""
+        return self._store(sport, event, time.time() if now is None else now)[1]
+    
+    def _store(self, sport: str, event: Dict, now: float) -> Tuple[Optional[str], Optional['EventQuotes']]:
+        """(event id or None if unusable, quote table or None if unchanged)"""
+        try:
+            event_id = self.event_id(event)
+            stamps = {bm['key']: self.bookmaker_stamp(bm) for bm in event['bookmakers']}
+        except KeyError:
+            return None, None
+        
+        entry = self.events.get(event_id)
+        
+        if entry is None:
+            commence_ts = parse_api_time(event.get('commence_time'))
+            if commence_ts is not None and commence_ts <= now:
+                return event_id, None  # Already started
+            entry = self.events[event_id] = {
+                'sport': sport, 'commence_ts': commence_ts, 'stamps': None, 'event': None
+            }
+        
+        if entry['stamps'] == stamps:
+            return event_id, None
+        
+        quotes = EventQuotes.from_api(event, now)
+        if quotes is None:
+            return event_id, None  # Malformed; retried with the next payload
+        entry['stamps'] = stamps
+        entry['event'] = quotes
+        return event_id, quotes
+    
+    def prune(self, now: Optional[float] = None):
+        """Drop events whose commence_time has passed"""
+        now = time.time() if now is None else now
+        for event_id in [eid for eid, entry in self.events.items()
+                         if entry['commence_ts'] is not None and entry['commence_ts'] <= now]:
+            del self.events[event_id]
+    
+    def near_kickoff(self, sport: str, window: float, now: Optional[float] = None) -> int:
+        """Number of cached events in a sport starting within `window` seconds"""
+        now = time.time() if now is None else now
+        return sum(1 for entry in self.events.values()
+                   if entry['sport'] == sport and entry['commence_ts'] is not None
+                   and entry['commence_ts'] - now <= window)
+    
+    def __len__(self):
+        return len(self.events)
+
+# ============================================================================
+# DEDUPE STORE
+# ============================================================================
+
+class DedupeStore:
+    """
+    Remembers alerted opportunities so the same arb isn't sent twice.
+    Entries expire at kickoff (or after a TTL), the store is capped in size,
+    and it is persisted to SQLite so a restart doesn't re-alert live arbs.
+    An arb is only re-alerted if its profit moved by at least `min_change` points.
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEDUPE_MAX_ENTRIES,
+                 ttl: float = DEDUPE_TTL, min_change: float = MIN_PROFIT_CHANGE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_change = min_change
+        self.entries = OrderedDict()  # key -> (profit_percent, expires_at), oldest alert first
+        self.lock = Lock()
+        self.next_sweep = 0.0
+        
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            with self.db:
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS seen ("
+                    "key TEXT PRIMARY KEY, profit REAL, expires_at REAL, alerted_at REAL)"
+                )
+            self._load()
+    
+    def _load(self):
+        now = time.time()
+        with self.db:
+            self.db.execute("DELETE FROM seen WHERE expires_at <= ?", (now,))
+        rows = self.db.execute(
+            "SELECT key, profit, expires_at FROM seen ORDER BY alerted_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for key, profit, expires_at in reversed(rows):
+            self.entries[key] = (profit, expires_at)
+    
+    def _alerted(self, key: str, profit_percent: float, now: float) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[1] > now and abs(profit_percent - entry[0]) < self.min_change
+    
+    def alerted(self, key: str, profit_percent: float) -> bool:
+        """True if the opportunity was already alerted at about this profit (records nothing)"""
+        with self.lock:
+            return self._alerted(key, profit_percent, time.time())
+    
+    def should_alert(self, key: str, profit_percent: float,
+                     commence_ts: Optional[float] = None) -> bool:
+        """Record the opportunity and return True if it deserves a (fresh) alert"""
+        now = time.time()
+        
+        with self.lock:
+            if self._alerted(key, profit_percent, now):
+                return False  # Already alerted, price hasn't moved materially
+            
+            expires_at = now + self.ttl
+            if commence_ts is not None:
+                expires_at = min(expires_at, commence_ts)
+            
+            self.entries[key] = (profit_percent, expires_at)
+            self.entries.move_to_end(key)
+            
+            if self.db:
+                with self.db:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO seen (key, profit, expires_at, alerted_at) VALUES (?, ?, ?, ?)",
+                        (key, profit_percent, expires_at, now)
+                    )
+            
+            self._evict(now)
+            return True
+    
+    def _evict(self, now: float):
+        dropped = []
+        
+        # Expired entries are swept at most once a minute
+        if now >= self.next_sweep:
+            self.next_sweep = now + 60
+            dropped = [key for key, (_, expires_at) in self.entries.items() if expires_at <= now]
+            for key in dropped:
+                del self.entries[key]
+        
+        while len(self.entries) > self.max_entries:
+            dropped.append(self.entries.popitem(last=False)[0])
+        
+        if dropped and self.db:
+            with self.db:
+                self.db.executemany("DELETE FROM seen WHERE key = ?", [(key,) for key in dropped])
+    
+    def __len__(self):
+        return len(self.entries)
+
+# ============================================================================
+# LIVE STREAM (Server-Sent Events)
+# ============================================================================
+
+class StreamSubscriber:
+    __slots__ = ('queue', 'dropped')
+    
+    def __init__(self, size: int):
+        self.queue = Queue(maxsize=size)
+        self.dropped = False
+
+
+class OpportunityStream:
+    """
+    Fan-out of scan results to /stream subscribers.
+    Tracks which arbs are open so each scan publishes only what changed:
+    'opportunity' (new arb), 'update' (prices moved) and 'closed'.
+    Recent events stay in a ring buffer for Last-Event-ID resume. Each
+    subscriber has a bounded queue; one that falls behind is cut off
+    (never blocking the scan) and catches up from the buffer on reconnect.
+    """
+    
+    def __init__(self, buffer_size: int = SSE_BUFFER_SIZE, queue_size: int = SSE_QUEUE_SIZE):
+        self.lock = Lock()
+        self.buffer = deque(maxlen=buffer_size)   # (id, event type, JSON data)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        # Millisecond start so ids keep increasing across restarts
+        self.sequence = itertools.count(int(time.time() * 1000))
+        self.open = {}  # opportunity key -> latest published opportunity
+    
+    def track(self, opportunities: List[Dict], scanned_event_ids: Iterable[str]):
+        """Publish the difference between a scan's arbs and the open set"""
+        scanned = set(scanned_event_ids)
+        current = {opp['key']: opp for opp in opportunities}
+        now = time.time()
+        changes = []
+        
+        with self.lock:
+            for key, opp in current.items():
+                previous = self.open.get(key)
+                if previous is None:
+                    changes.append(('opportunity', opp))
+                elif previous['bets'] != opp['bets'] or previous['profit_percent'] != opp['profit_percent']:
+                    changes.append(('update', opp))
+                self.open[key] = opp
+            
+            # Gone from a rescanned event, or the event has started
+            for key, opp in list(self.open.items()):
+                if key in current:
+                    continue
+                commence_ts = parse_api_time(opp['commence_time'])
+                if opp['event_id'] in scanned or (commence_ts is not None and commence_ts <= now):
+                    del self.open[key]
+                    changes.append(('closed', {'key': key, 'sport': opp['sport'], 'event_id': opp['event_id']}))
+        
+        for event_type, payload in changes:
+            self.publish(event_type, payload)
+    
+    def publish(self, event_type: str, payload: Dict):
+        data = json.dumps(payload)
+        with self.lock:
+            event = (next(self.sequence), event_type, data)
+            self.buffer.append(event)
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.queue.put_nowait(event)
+                except Full:
+                    subscriber.dropped = True
+                    self.subscribers.discard(subscriber)
+                    metrics.inc('arb_stream_dropped_subscribers_total')
+            metrics.set('arb_stream_subscribers', len(self.subscribers))
+        metrics.inc('arb_stream_events_total', type=event_type)
+    
+    def subscribe(self, last_event_id: Optional[int]) -> Tuple[StreamSubscriber, List[Tuple], bool]:
+        """New subscriber plus the buffered events it missed; False if some already fell out of the buffer"""
+        with self.lock:
+            subscriber = StreamSubscriber(self.queue_size)
+            self.subscribers.add(subscriber)
+            metrics.set('arb_stream_subscribers', len(self.subscribers))
+            if last_event_id is None:
+                return subscriber, [], False
+            backlog = [event for event in self.buffer if event[0] > last_event_id]
+            complete = bool(self.buffer) and self.buffer[0][0] <= last_event_id + 1
+            return subscriber, backlog, complete
+    
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            metrics.set('arb_stream_subscribers', len(self.subscribers))
+    
+    def snapshot(self) -> List[Dict]:
+        with self.lock:
+            return list(self.open.values())
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Latest published version of an open arb, None once it closed"""
+        with self.lock:
+            return self.open.get(key)
+    
+    def events(self, last_event_id: Optional[int], heartbeat: float = SSE_HEARTBEAT) -> Iterator[str]:
+        """SSE text for one client: the missed backlog (or a snapshot of open arbs), then live events"""
+        subscriber, backlog, complete = self.subscribe(last_event_id)
+        try:
+            yield "retry: 1000\n\n"
+            if not complete:
+                # New client, or it missed more than the buffer holds: start from current state
+                yield f"event: snapshot\ndata: {json.dumps(self.snapshot())}\n\n"
+            for event_id, event_type, data in backlog:
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+            
+            while True:
+                try:
+                    event_id, event_type, data = subscriber.queue.get(timeout=heartbeat)
+                except Empty:
+                    if subscriber.dropped:
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+                if subscriber.dropped and subscriber.queue.empty():
+                    return  # Too slow: the client reconnects and resumes from the buffer
+        finally:
+            self.unsubscribe(subscriber)
+
+
+live_stream = OpportunityStream()
+
+# ============================================================================
+# ODDS SNAPSHOT RECORDER
+# ============================================================================
+
+# One fixed-width record per quote (56 bytes):
+# fetched_at, sport, event, home, away, commence, bookmaker, bookmaker title,
+# last_update, market, outcome, point (NaN if none), price x1000. last_update is
+# the market's (the scanner's staleness clock), else the bookmaker's.
+# String fields are ids into the day's string table.
+SNAPSHOT_RECORD = struct.Struct('<d4II2II2IfI')
+SNAPSHOT_FIELDS = ('fetched_at', 'sport', 'event', 'home_team', 'away_team', 'commence',
+                   'bookmaker', 'bookmaker_title', 'last_update', 'market', 'outcome',
+                   'point', 'price')
+SNAPSHOT_STRING_FIELDS = ('sport', 'event', 'home_team', 'away_team', 'bookmaker',
+                          'bookmaker_title', 'market', 'outcome')
+
+
+def snapshot_paths(directory: str, day: str) -> Tuple[str, str]:
+    """(records file, string table file) for a YYYYMMDD day"""
+    base = os.path.join(directory, f"odds-{day}")
+    return base + '.bin', base + '.strings'
+
+
+class SnapshotRecorder:
+    """
+    Append-only odds history.
+    The scan path only enqueues the filtered payload; a background thread
+    normalizes it into fixed-width records, interns team/bookmaker names in
+    a per-day string table and appends both in batches. Files rotate daily (UTC).
+    """
+    
+    def __init__(self, directory: str = SNAPSHOT_DIR, flush_interval: float = SNAPSHOT_FLUSH_INTERVAL,
+                 max_pending: int = 1000):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.queue = Queue(maxsize=max_pending)
+        self.day = None
+        self.strings = {}  # string -> id for the current day
+        self.thread = Thread(target=self._run, daemon=True)
+        os.makedirs(directory, exist_ok=True)
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def record(self, sport: str, events: List[Dict], fetched_at: Optional[float] = None):
+        """Queue a payload for writing (never blocks the caller)"""
+        try:
+            self.queue.put_nowait((fetched_at or time.time(), sport, events))
+        except Full:
+            metrics.inc('arb_snapshots_dropped_total')
+    
+    def stop(self, timeout: float = 10):
+        self.queue.put((None, None, None))
+        self.thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1][0] is not None and time.monotonic() < deadline:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except Empty:
+                    break
+            
+            stopping = batch[-1][0] is None
+            if stopping:
+                batch.pop()
+            try:
+                self._write(batch)
+            except OSError as e:
+                print(f"⚠️  Snapshot write failed: {e}")
+            if stopping:
+                break
+    
+    def _open_day(self, day: str):
+        """Switch to a day's files, reloading its string table if it already exists"""
+        self.day = day
+        self.strings = {}
+        _, strings_path = snapshot_paths(self.directory, day)
+        if os.path.exists(strings_path):
+            with open(strings_path, encoding='utf-8') as f:
+                for line in f:
+                    self.strings.setdefault(json.loads(line), len(self.strings))
+    
+    def _write(self, batch: List[Tuple[float, str, List[Dict]]]):
+        by_day = {}
+        for fetched_at, sport, events in batch:
+            day = datetime.fromtimestamp(fetched_at, timezone.utc).strftime('%Y%m%d')
+            by_day.setdefault(day, []).append((fetched_at, sport, events))
+        
+        for day, payloads in sorted(by_day.items()):
+            if day != self.day:
+                self._open_day(day)
+            
+            new_strings = []
+            
+            def intern(value: str) -> int:
+                string_id = self.strings.get(value)
+                if string_id is None:
+                    string_id = self.strings[value] = len(self.strings)
+                    new_strings.append(value)
+                return string_id
+            
+            records = bytearray()
+            for fetched_at, sport, events in payloads:
+                sport_id = intern(sport)
+                for event in events:
+                    try:
+                        event_id = intern(OddsCache.event_id(event))
+                        home = intern(event['home_team'])
+                        away = intern(event['away_team'])
+                        commence = int(parse_api_time(event.get('commence_time')) or 0)
+                        for bookmaker in event['bookmakers']:
+                            bookmaker_id = intern(bookmaker['key'])
+                            title = intern(bookmaker.get('title', bookmaker['key']))
+                            bookmaker_update = parse_api_time(bookmaker.get('last_update'))
+                            for market in bookmaker['markets']:
+                                market_id = intern(market['key'])
+                                last_update = int(parse_api_time(market.get('last_update')) or bookmaker_update or 0)
+                                for outcome in market['outcomes']:
+                                    point = outcome.get('point')
+                                    records += SNAPSHOT_RECORD.pack(
+                                        fetched_at, sport_id, event_id, home, away, commence,
+                                        bookmaker_id, title, last_update, market_id,
+                                        intern(outcome['name']),
+                                        float('nan') if point is None else point,
+                                        round(outcome['price'] * 1000)
+                                    )
+                    except (KeyError, TypeError):
+                        continue
+            
+            # Strings first, so records never point at an id that isn't on disk
+            records_path, strings_path = snapshot_paths(self.directory, day)
+            if new_strings:
+                with open(strings_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(s) + '\n' for s in new_strings))
+            with open(records_path, 'ab') as f:
+                f.write(records)
+            metrics.inc('arb_snapshot_records_total', len(records) // SNAPSHOT_RECORD.size)
+
+
+class SnapshotReader:
+    """Memory-mapped reader for one day of recorded odds"""
+    
+    def __init__(self, records_path: str):
+        self.records_path = records_path
+        self.strings = []
+        strings_path = records_path[:-len('.bin')] + '.strings'
+        with open(strings_path, encoding='utf-8') as f:
+            self.strings = [json.loads(line) for line in f]
+        
+        self.file = open(records_path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        # A crash mid-append can leave a partial record at the end; ignore it
+        self.count = size // SNAPSHOT_RECORD.size
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+    
+    def __len__(self):
+        return self.count
+    
+    def records(self) -> Iterator[Tuple]:
+        """Raw records (string fields as ids, price x1000)"""
+        if not self.count:
+            return iter(())
+        view = memoryview(self.mmap)[:self.count * SNAPSHOT_RECORD.size]
+        return SNAPSHOT_RECORD.iter_unpack(view)
+    
+    def quotes(self) -> Iterator[Dict]:
+        """Decoded records as dicts"""
+        strings = self.strings
+        for record in self.records():
+            quote = dict(zip(SNAPSHOT_FIELDS, record))
+            for field in SNAPSHOT_STRING_FIELDS:
+                quote[field] = strings[quote[field]]
+            quote['price'] = quote['price'] / 1000
+            if quote['point'] != quote['point']:  # NaN
+                quote['point'] = None
+            yield quote
+    
+    def payloads(self, sports: Optional[Iterable[str]] = None) -> Iterator[Tuple[float, str, List[Dict]]]:
+        """(fetched_at, sport, events) for every recorded fetch, rebuilt in the Odds API shape"""
+        strings = self.strings
+        if sports is None:
+            records = self.records()
+        else:
+            string_ids = {value: i for i, value in enumerate(strings)}
+            sport_ids = [string_ids[sport] for sport in sports if sport in string_ids]
+            if np is not None:
+                table = self.array()
+                selected = table[np.isin(table['sport'], sport_ids)]
+                del table
+                # Decode in slices so a large day never becomes one huge list of tuples
+                records = itertools.chain.from_iterable(
+                    selected[i:i + 65536].tolist() for i in range(0, len(selected), 65536))
+            else:
+                sport_ids = set(sport_ids)
+                records = (record for record in self.records() if record[1] in sport_ids)
+        
+        stamp = lru_cache(maxsize=4096)(format_api_time)
+        
+        # Each fetch was written as one contiguous run of records
+        for (fetched_at, sport), group in itertools.groupby(records, key=lambda r: (r[0], r[1])):
+            events = {}
+            for (_, _, event_id, home, away, commence, bookmaker_id, title, last_update,
+                 market_id, outcome, point, price) in group:
+                event = events.get(event_id)
+                if event is None:
+                    event = events[event_id] = {
+                        'id': strings[event_id],
+                        'sport_key': strings[sport],
+                        'commence_time': format_api_time(commence),
+                        'home_team': strings[home],
+                        'away_team': strings[away],
+                        'bookmakers': {},
+                    }
+                bookmaker = event['bookmakers'].get(bookmaker_id)
+                if bookmaker is None:
+                    bookmaker = event['bookmakers'][bookmaker_id] = {
+                        'key': strings[bookmaker_id],
+                        'title': strings[title],
+                        'markets': {},
+                    }
+                market = bookmaker['markets'].get(market_id)
+                if market is None:
+                    market = bookmaker['markets'][market_id] = {
+                        'key': strings[market_id], 'last_update': last_update, 'outcomes': []}
+                entry = {'name': strings[outcome], 'price': price / 1000}
+                if point == point:  # not NaN
+                    entry['point'] = point
+                market['outcomes'].append(entry)
+            
+            for event in events.values():
+                event['bookmakers'] = list(event['bookmakers'].values())
+                for bookmaker in event['bookmakers']:
+                    bookmaker['markets'] = list(bookmaker['markets'].values())
+                    # The bookmaker's stamp is its newest market's, as in the live API;
+                    # 0 means none was recorded (a 1970 stamp would read as stale)
+                    newest = max(market['last_update'] for market in bookmaker['markets'])
+                    if newest:
+                        bookmaker['last_update'] = stamp(newest)
+                    for market in bookmaker['markets']:
+                        if market['last_update']:
+                            market['last_update'] = stamp(market['last_update'])
+                        else:
+                            del market['last_update']
+            yield fetched_at, strings[sport], list(events.values())
+    
+    def array(self):
+        """Zero-copy NumPy structured view of the records (requires numpy)"""
+        dtype = np.dtype([
+            ('fetched_at', '<f8'), ('sport', '<u4'), ('event', '<u4'), ('home_team', '<u4'),
+            ('away_team', '<u4'), ('commence', '<u4'), ('bookmaker', '<u4'),
+            ('bookmaker_title', '<u4'), ('last_update', '<u4'), ('market', '<u4'),
+            ('outcome', '<u4'), ('point', '<f4'), ('price', '<u4'),
+        ])
+        if not self.count:
+            return np.zeros(0, dtype=dtype)
+        return np.frombuffer(self.mmap, dtype=dtype, count=self.count)
+    
+    def close(self):
+        if self.mmap:
+            self.mmap.close()
+        self.file.close()
+
+# ============================================================================
+# BOOKMAKER FILTER (streaming)
+# ============================================================================
+
+class BookmakerFilter:
+    """
+    Compiled once: an exact-key set for the common case, plus one
+    case-insensitive pattern for substring matches on key/title.
+    Decisions are memoized since the same bookmakers repeat in every event.
+    """
+    
+    def __init__(self, bookmakers: List[str]):
+        names = [b.lower() for b in bookmakers]
+        self.keys = frozenset(names)
+        self.pattern = re.compile('|'.join(re.escape(n) for n in names), re.IGNORECASE)
+        self._decisions = {}
+    
+    def matches(self, key: str, title: str) -> bool:
+        if key in self.keys:
+            return True
+        
+        decision = self._decisions.get((key, title))
+        if decision is None:
+            decision = bool(self.pattern.search(key) or self.pattern.search(title))
+            self._decisions[(key, title)] = decision
+        return decision
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_json_decoder = json.JSONDecoder()
+
+
+class OddsStreamParser:
+    """
+    Incremental parser for an Odds API odds array.
+    Each event is decoded by the C JSON scanner as soon as it is complete in
+    the buffer, and its unwanted bookmakers are dropped straight away, so
+    only about one unfiltered event is held at a time instead of the whole
+    payload. (Skipping unwanted bookmakers as raw text in Python costs more
+    than letting the C decoder build and discard them.)
+    """
+    
+    def __init__(self, bookmaker_filter: BookmakerFilter):
+        self.filter = bookmaker_filter
+        # Time spent waiting on `chunks` and in the filter, for stage metrics
+        self.read_seconds = 0.0
+        self.filter_seconds = 0.0
+    
+    def iter_events(self, chunks: Iterable[bytes]) -> Iterator[Dict]:
+        """Yield events that still have at least one wanted bookmaker"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        chunks = iter(chunks)
+        matches = self.filter.matches
+        buf = ''
+        pos = 0
+        started = False
+        need_comma = False
+        exhausted = False
+        
+        while True:
+            # An event that runs off the end of the buffer raises IndexError or
+            # a JSONDecodeError; read more and retry from the last good position
+            try:
+                p = _WHITESPACE.match(buf, pos).end()
+                if not started:
+                    if buf[p] != '[':
+                        raise ValueError("Expected a JSON array of events")
+                    pos = p + 1
+                    started = True
+                    continue
+                
+                if buf[p] == ']':
+                    return
+                if need_comma:
+                    if buf[p] != ',':
+                        raise ValueError(f"Unexpected {buf[p]!r} between events")
+                    p = _WHITESPACE.match(buf, p + 1).end()
+                
+                event, pos = _json_decoder.raw_decode(buf, p)
+                need_comma = True
+            except (IndexError, ValueError):
+                if exhausted:
+                    raise ValueError("Malformed or truncated odds payload")
+                # Grow the unparsed tail geometrically so a large event split
+                # over small chunks isn't re-parsed once per chunk
+                wanted = max(len(buf) - pos, 1)
+                received = []
+                while wanted > 0:
+                    read_start = time.perf_counter()
+                    chunk = next(chunks, None)
+                    self.read_seconds += time.perf_counter() - read_start
+                    if chunk is None:
+                        exhausted = True
+                        received.append(decoder.decode(b'', final=True))
+                        break
+                    received.append(decoder.decode(chunk))
+                    wanted -= len(chunk)
+                # Only the unparsed tail is kept, so the buffer stays a chunk or two long
+                buf = buf[pos:] + ''.join(received)
+                pos = 0
+                continue
+            
+            filter_start = time.perf_counter()
+            bookmakers = event.get('bookmakers') or ()
+            kept = [bm for bm in bookmakers if matches(bm.get('key', ''), bm.get('title', ''))]
+            self.filter_seconds += time.perf_counter() - filter_start
+            if kept:
+                event['bookmakers'] = kept
+                yield event
+
+# ============================================================================
+# MARKETS
+# ============================================================================
+
+SUPPORTED_MARKETS = ('h2h', 'totals', 'spreads')
+H2H_GROUP = ('h2h', None)
+
+
+def market_group(market_key: str, outcome: Dict, home_team: str) -> Tuple[str, Optional[float]]:
+    """
+    Key under which complementary outcomes are compared:
+    h2h -> ('h2h', None), totals -> ('totals', line) for Over/Under,
+    spreads -> ('spreads', home line), so "Home -1.5" meets "Away +1.5".
+    """
+    if market_key == 'h2h':
+        return H2H_GROUP
+    point = outcome.get('point')
+    if point is None:
+        return (market_key, None)
+    if market_key == 'spreads' and outcome['name'] != home_team:
+        point = -point
+    return (market_key, point + 0.0)  # + 0.0 folds -0.0 into 0.0
+
+
+def required_outcomes(market_key: str, is_3_way: bool) -> int:
+    return 3 if market_key == 'h2h' and is_3_way else 2
+
+
+def opportunity_key(event_id: str, market: str, point: Optional[float]) -> str:
+    """Dedupe key: one per event market line"""
+    if market == 'h2h':
+        return event_id
+    return f"{event_id}_{market}_{point}"
+
+
+def market_display_name(market: str, point: Optional[float]) -> str:
+    if market == 'h2h':
+        return "Match Winner"
+    if market == 'totals':
+        return f"Total {point:g}" if point is not None else "Total"
+    if market == 'spreads':
+        return f"Handicap {point:+g}" if point is not None else "Handicap"
+    return market
+
+# ============================================================================
+# EVENT MODEL
+# ============================================================================
+
+class Interner:
+    """Two-way string <-> small int table, so hot loops compare ints instead of strings"""
+    
+    __slots__ = ('ids', 'names', 'lock')
+    
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.lock = Lock()
+    
+    def id(self, name: str) -> int:
+        value = self.ids.get(name)
+        if value is None:
+            with self.lock:
+                value = self.ids.get(name)
+                if value is None:
+                    value = self.ids[name] = len(self.names)
+                    self.names.append(name)
+        return value
+    
+    def name(self, value: int) -> str:
+        return self.names[value]
+
+
+BOOKMAKER_IDS = Interner()
+OUTCOME_IDS = Interner()
+BOOKMAKER_TITLES = {}  # bookmaker id -> display title from the latest feed
+
+
+class EventQuotes:
+    """
+    One event's odds as a compact quote table.
+    Quotes are stored per cell (market line x outcome, in feed order) and
+    cells per line, all in flat arrays, so a best price is one C-level max()
+    over a contiguous slice. Bookmakers and outcomes are interned ids.
+    """
+    
+    __slots__ = ('id', 'sport_key', 'home_team', 'away_team', 'commence_time', 'commence_ts',
+                 'fetched_at', 'bookmakers', 'lines', 'line_starts', 'cell_outcomes', 'cell_starts',
+                 'quote_bookmakers', 'prices', 'quote_updated', 'closest')
+    
+    @classmethod
+    def from_api(cls, event: Dict, fetched_at: Optional[float] = None) -> Optional['EventQuotes']:
+        """Build from an Odds API event dict (None if it is malformed)"""
+        try:
+            home_team = event['home_team']
+            # (market, point, outcome name) -> ([bookmaker index, ...], [price, ...], [updated, ...])
+            cells = {}
+            lines = {}  # (market, point) -> first-seen order
+            bookmakers = array('I')
+            
+            for b, bookmaker in enumerate(event['bookmakers']):
+                bookmaker_id = BOOKMAKER_IDS.id(bookmaker['key'])
+                BOOKMAKER_TITLES[bookmaker_id] = bookmaker['title']
+                bookmakers.append(bookmaker_id)
+                # Unknown update time: never treated as stale
+                bookmaker_updated = parse_api_time(bookmaker.get('last_update')) or float('inf')
+                
+                for market in bookmaker['markets']:
+                    market_key = market['key']
+                    if market_key not in SUPPORTED_MARKETS:
+                        continue
+                    updated = parse_api_time(market.get('last_update')) or bookmaker_updated
+                    for outcome in market['outcomes']:
+                        group = H2H_GROUP if market_key == 'h2h' else market_group(market_key, outcome, home_team)
+                        key = group + (outcome['name'],)
+                        quotes = cells.get(key)
+                        if quotes is None:
+                            quotes = cells[key] = ([], [], [])
+                            if group not in lines:
+                                lines[group] = len(lines)
+                        quotes[0].append(b)
+                        quotes[1].append(outcome['price'])
+                        quotes[2].append(updated)
+            
+            self = cls()
+            self.id = OddsCache.event_id(event)
+            self.sport_key = event.get('sport_key')
+            self.home_team = home_team
+            self.away_team = event['away_team']
+            self.commence_time = event['commence_time']
+            self.commence_ts = parse_api_time(self.commence_time)
+            self.fetched_at = time.time() if fetched_at is None else fetched_at
+            self.closest = float('inf')  # lowest implied-probability sum, set by the scan
+            self.bookmakers = bookmakers
+            self.lines = tuple(lines)
+            self.line_starts = line_starts = array('I', [0])
+            self.cell_outcomes = cell_outcomes = array('I')
+            self.cell_starts = cell_starts = array('I', [0])
+            self.quote_bookmakers = quote_bookmakers = array('H')
+            self.prices = prices = array('d')
+            self.quote_updated = quote_updated = array('d')
+            
+            # Cells of a line end up contiguous, each line's outcomes in first-seen order
+            line = 0
+            for (market_key, point, name), (books, quotes, updates) in sorted(
+                    cells.items(), key=lambda cell: lines[cell[0][:2]]):
+                if lines[(market_key, point)] != line:
+                    line_starts.append(len(cell_outcomes))
+                    line += 1
+                cell_outcomes.append(OUTCOME_IDS.id(name))
+                quote_bookmakers.extend(books)
+                prices.extend(quotes)
+                quote_updated.extend(updates)
+                cell_starts.append(len(prices))
+            if cells:
+                line_starts.append(len(cell_outcomes))
+            return self
+        except (KeyError, IndexError, TypeError):
+            return None
+
+
+class Opportunity:
+    """A found arb, kept as a slotted record until it is formatted (see build_opportunity)"""
+    
+    __slots__ = ('event', 'market', 'point', 'profit_percent', 'implied_prob_sum',
+                 'outcomes', 'odds', 'bookmakers', 'stakes', 'quote_times', 'scanned_at')
+    
+    def __init__(self, event: EventQuotes, market: str, point: Optional[float], profit_percent: float,
+                 implied_prob_sum: float, outcomes: List[int], odds: List[float],
+                 bookmakers: List[int], stakes: List[float], quote_times: List[float]):
+        self.event = event
+        self.market = market
+        self.point = point
+        self.profit_percent = profit_percent
+        self.implied_prob_sum = implied_prob_sum
+        self.outcomes = outcomes      # interned outcome ids, in feed order
+        self.odds = odds              # best price per outcome
+        self.bookmakers = bookmakers  # interned id of the bookmaker offering each best price
+        self.stakes = stakes
+        self.quote_times = quote_times  # last_update of each best price
+        self.scanned_at = time.time()
+    
+    @property
+    def key(self) -> str:
+        return opportunity_key(self.event.id, self.market, self.point)
+
+# ============================================================================
+# BATCH SCANNER (NumPy)
+# ============================================================================
+
+def scan_batch(events: List[EventQuotes], is_3_way: bool, total_stake: float,
+               min_profit: float, now: Optional[float] = None) -> List[Opportunity]:
+    """
+    Vectorized version of ArbitrageFinder.find_arbs.
+    Concatenates a sport's quote tables and finds best prices, implied-probability
+    sums, profit and stakes for every market line with a few reduceat calls.
+    """
+    events = [event for event in events if event.lines]
+    if not events:
+        return []
+    
+    price_arrays, update_arrays, cell_bounds, line_bounds, bookmaker_ids = [], [], [], [], []
+    line_refs = []  # (event, line index) per global line
+    quote_offset = cell_offset = 0
+    for event in events:
+        price_arrays.append(np.frombuffer(event.prices, dtype=np.float64))
+        update_arrays.append(np.frombuffer(event.quote_updated, dtype=np.float64))
+        cell_bounds.append(np.frombuffer(event.cell_starts, dtype=np.uint32)[:-1].astype(np.int64) + quote_offset)
+        line_bounds.append(np.frombuffer(event.line_starts, dtype=np.uint32)[:-1].astype(np.int64) + cell_offset)
+        bookmaker_ids.append(np.frombuffer(event.bookmakers, dtype=np.uint32)[np.frombuffer(event.quote_bookmakers, dtype=np.uint16)])
+        line_refs += [(event, line) for line in range(len(event.lines))]
+        quote_offset += len(event.prices)
+        cell_offset += len(event.cell_outcomes)
+    
+    prices = np.concatenate(price_arrays)
+    updated = np.concatenate(update_arrays)
+    cell_starts = np.concatenate(cell_bounds)
+    line_starts = np.concatenate(line_bounds)
+    quote_bookmaker_ids = np.concatenate(bookmaker_ids)
+    
+    # Stale quotes are zeroed, so they never win and an outcome with nothing fresh drops out
+    if MAX_QUOTE_AGE:
+        cutoff = (time.time() if now is None else now) - MAX_QUOTE_AGE
+        fresh = updated >= cutoff
+        stale_quotes = len(prices) - int(np.count_nonzero(fresh))
+        if stale_quotes:
+            prices = np.where(fresh, prices, 0.0)
+            metrics.inc('arb_stale_quotes_total', stale_quotes)
+    
+    # Best price per cell, and the first quote that offers it (the loop's tie-break)
+    best = np.maximum.reduceat(prices, cell_starts)
+    cell_sizes = np.diff(np.append(cell_starts, len(prices)))
+    positions = np.where(prices == np.repeat(best, cell_sizes), np.arange(len(prices)), len(prices))
+    winners = np.minimum.reduceat(positions, cell_starts)
+    present = best > 0
+    
+    n_cells = np.diff(np.append(line_starts, len(best)))
+    n_outcomes = np.add.reduceat(present.astype(np.int64), line_starts)
+    required = np.array([required_outcomes(event.lines[line][0], is_3_way) for event, line in line_refs])
+    valid = (n_outcomes >= required) & (np.minimum.reduceat(np.where(present, best, np.inf), line_starts) > 1)
+    
+    # Summed outcome by outcome (zero-padded) so rounding matches the loop's sum() exactly
+    line_of_cell = np.repeat(np.arange(len(line_refs)), n_cells)
+    inverse = np.zeros((len(line_refs), n_cells.max()))
+    inverse[line_of_cell, np.arange(len(best)) - line_starts[line_of_cell]] = np.divide(
+        1, best, out=np.zeros_like(best), where=present)
+    implied_prob_sum = inverse[:, 0].copy()
+    for column in range(1, inverse.shape[1]):
+        implied_prob_sum += inverse[:, column]
+    
+    # How close each event came to an arb, for the hot set
+    lines_per_event = [len(event.lines) for event in events]
+    closeness = np.where(valid, implied_prob_sum, np.inf)
+    event_first_line = np.cumsum([0] + lines_per_event[:-1])
+    for event, closest in zip(events, np.minimum.reduceat(closeness, event_first_line).tolist()):
+        event.closest = closest
+    
+    is_arb = valid & (implied_prob_sum < 1)
+    profit_percent = np.full(len(line_refs), -np.inf)
+    profit_percent[is_arb] = ((1 / implied_prob_sum[is_arb]) - 1) * 100
+    
+    opportunities = []
+    for r in np.flatnonzero(profit_percent >= min_profit):
+        event, line = line_refs[r]
+        market, point = event.lines[line]
+        cells = np.arange(line_starts[r], line_starts[r] + n_cells[r])
+        cells = cells[present[cells]]
+        odds = best[cells]
+        outcomes = np.asarray(event.cell_outcomes[event.line_starts[line]:event.line_starts[line + 1]])
+        opportunities.append(Opportunity(
+            event, market, point, float(profit_percent[r]), float(implied_prob_sum[r]),
+            outcomes[cells - line_starts[r]].tolist(),
+            odds.tolist(),
+            quote_bookmaker_ids[winners[cells]].tolist(),
+            ((total_stake / implied_prob_sum[r]) / odds).tolist(),
+            updated[winners[cells]].tolist(),
+        ))
+    
+    return opportunities
+
+# ============================================================================
+# FETCH RESILIENCE
+# ============================================================================
+
+class FetchCancelled(Exception):
+    """A fetch abandoned because a hedge answered first or the deadline passed"""
+
+
+class LatencyTracker:
+    """Rolling window of successful fetch times per endpoint, for hedging decisions"""
+    
+    def __init__(self, window: int = 200, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self.samples = {}  # endpoint -> deque of seconds
+        self.lock = Lock()
+    
+    def record(self, endpoint: str, seconds: float):
+        with self.lock:
+            samples = self.samples.get(endpoint)
+            if samples is None:
+                samples = self.samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+    
+    def percentile(self, endpoint: str, percent: float) -> Optional[float]:
+        """None until the endpoint has min_samples latencies"""
+        with self.lock:
+            samples = sorted(self.samples.get(endpoint, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class CircuitBreaker:
+    """
+    Per-key breaker. `failures` consecutive failures open it for `cooldown`
+    seconds; after that a single trial call is let through (half-open), which
+    closes it on success or reopens it on failure.
+    """
+    
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = {}  # key -> {'failures', 'open_until', 'trial'}
+        self.lock = Lock()
+    
+    def allow(self, key: str) -> bool:
+        with self.lock:
+            state = self.state.get(key)
+            if state is None or state['failures'] < self.failures:
+                return True
+            if time.monotonic() < state['open_until'] or state['trial']:
+                return False
+            state['trial'] = True
+            return True
+    
+    def success(self, key: str):
+        with self.lock:
+            tripped = self.state.pop(key, {'failures': 0})['failures'] >= self.failures
+        if tripped:
+            print(f"✅ {key}: fetching again, circuit closed")
+            metrics.set('arb_breaker_open', 0, sport=key)
+    
+    def failure(self, key: str):
+        with self.lock:
+            state = self.state.setdefault(key, {'failures': 0, 'open_until': 0.0, 'trial': False})
+            state['failures'] += 1
+            state['trial'] = False
+            if state['failures'] >= self.failures:
+                state['open_until'] = time.monotonic() + self.cooldown
+            tripped = state['failures'] == self.failures
+        if tripped:
+            print(f"🔌 {key}: {self.failures}+ failed fetches, skipping it for {self.cooldown:.0f}s")
+            metrics.set('arb_breaker_open', 1, sport=key)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, 429 and 5xx are worth another try; other 4xx are not"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.exceptions.RequestException, FetchCancelled, ValueError))
+
+# ============================================================================
+# ODDS PROVIDERS
+# ============================================================================
+
+# Words that say nothing about which team it is
+TEAM_NAME_NOISE = frozenset({'fc', 'afc', 'cf', 'sc', 'ac', 'cd', 'ssc', 'fk', 'sk', 'bk', 'the'})
+
+# Normalized nickname -> normalized full name
+TEAM_ALIASES = {
+    'man utd': 'manchester united',
+    'man united': 'manchester united',
+    'man city': 'manchester city',
+    'spurs': 'tottenham hotspur',
+    'tottenham': 'tottenham hotspur',
+    'wolves': 'wolverhampton wanderers',
+    'newcastle': 'newcastle united',
+    'west ham': 'west ham united',
+    'brighton': 'brighton and hove albion',
+    'nottm forest': 'nottingham forest',
+    'psg': 'paris saint germain',
+    'inter': 'inter milan',
+    'internazionale': 'inter milan',
+    'atletico': 'atletico madrid',
+    'bayern': 'bayern munich',
+    'bayern munchen': 'bayern munich',
+}
+
+# How other feeds spell the h2h draw outcome
+DRAW_NAMES = frozenset({'draw', 'tie', 'x'})
+
+
+@lru_cache(maxsize=8192)
+def normalize_team(name: str) -> str:
+    """'Brighton & Hove Albion FC' -> 'brighton and hove albion' (accents, punctuation, FC... dropped)"""
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    tokens = [t for t in re.split(r'[^a-z0-9]+', text.replace('&', ' and ')) if t and t not in TEAM_NAME_NOISE]
+    normalized = ' '.join(tokens)
+    return TEAM_ALIASES.get(normalized, normalized)
+
+
+def similar_teams(a: str, b: str) -> bool:
+    """Loose check for normalized names: 'man utd' ~ 'manchester united', 'inter milan' ~ 'inter'"""
+    short, long = sorted((a.split(), b.split()), key=len)
+    if all(any(word.startswith(token) or (token[0] == word[0] and _is_subsequence(token, word))
+               for word in long) for token in short):
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= 0.75
+
+
+def _is_subsequence(short: str, long: str) -> bool:
+    letters = iter(long)
+    return all(char in letters for char in short)
+
+
+class EventMatcher:
+    """
+    Finds the same fixture across feeds with dict lookups: exact normalized
+    (home, away) names first (either way round), then either team alone with
+    a similar opponent. Kickoffs must be within MATCH_WINDOW. Loose matches
+    are remembered as aliases, so the next payload matches exactly.
+    """
+    
+    def __init__(self, window: float = MATCH_WINDOW):
+        self.window = window
+        self.aliases = {}  # normalized feed name -> normalized canonical name
+        self.pairs = {}    # (home, away) -> [(commence_ts, event)]
+        self.teams = {}    # team -> [(commence_ts, event, is_home)]
+    
+    def reset(self):
+        self.pairs.clear()
+        self.teams.clear()
+    
+    def _name(self, name: str) -> str:
+        normalized = normalize_team(name)
+        return self.aliases.get(normalized, normalized)
+    
+    def add(self, event: Dict, commence_ts: Optional[float]):
+        if commence_ts is None:
+            return
+        home, away = self._name(event['home_team']), self._name(event['away_team'])
+        self.pairs.setdefault((home, away), []).append((commence_ts, event))
+        self.teams.setdefault(home, []).append((commence_ts, event, True))
+        self.teams.setdefault(away, []).append((commence_ts, event, False))
+    
+    def _closest(self, candidates, commence_ts: float):
+        best = min(candidates, key=lambda c: abs(c[0] - commence_ts), default=None)
+        if best is None or abs(best[0] - commence_ts) > self.window:
+            return None
+        return best
+    
+    def match(self, home_team: str, away_team: str,
+              commence_ts: Optional[float]) -> Optional[Tuple[Dict, bool]]:
+        """(canonical event, home/away swapped) or None"""
+        if commence_ts is None:
+            return None
+        home, away = self._name(home_team), self._name(away_team)
+        
+        for key, swapped in (((home, away), False), ((away, home), True)):
+            found = self._closest(self.pairs.get(key, ()), commence_ts)
+            if found:
+                return found[1], swapped
+        
+        # One side exact, the other spelled differently
+        for team, other, feed_home in ((home, away, True), (away, home, False)):
+            for commence, event, is_home in sorted(self.teams.get(team, ()),
+                                                   key=lambda c: abs(c[0] - commence_ts)):
+                if abs(commence - commence_ts) > self.window:
+                    break
+                canonical_other = self._name(event['away_team' if is_home else 'home_team'])
+                if similar_teams(other, canonical_other):
+                    self.aliases[other] = canonical_other
+                    return event, is_home != feed_home
+        return None
+
+
+def _bookmaker_time(bookmaker: Dict) -> float:
+    return parse_api_time(bookmaker.get('last_update')) or 0.0
+
+
+def _rename_outcomes(bookmaker: Dict, names: Dict[str, str]) -> Dict:
+    """Copy of a bookmaker with feed team names (and draw spellings) replaced by canonical ones"""
+    markets = []
+    for market in bookmaker.get('markets', ()):
+        outcomes = []
+        for outcome in market.get('outcomes', ()):
+            name = outcome.get('name')
+            canonical = names.get(name) or ('Draw' if isinstance(name, str) and name.lower() in DRAW_NAMES else name)
+            outcomes.append(outcome if canonical == name else dict(outcome, name=canonical))
+        markets.append(dict(market, outcomes=outcomes))
+    return dict(bookmaker, markets=markets)
+
+
+def merge_feeds(sport: str, primary: List[Dict], feeds: List[Tuple[str, List[Dict]]],
+                matcher: EventMatcher, bookmaker_filter: BookmakerFilter) -> List[Dict]:
+    """
+    One book per fixture: the primary (Odds API) events, plus every extra
+    feed's bookmakers attached to the fixture they match. A bookmaker quoted
+    by several feeds keeps its most recently updated copy. Unmatched events
+    are kept under a '<feed>:' id so later feeds can still match them.
+    """
+    matcher.reset()
+    merged = []
+    
+    def adopt(event: Dict, event_id: str) -> Dict:
+        copy = dict(event, id=event_id, sport_key=event.get('sport_key', sport),
+                    bookmakers=list(event.get('bookmakers', ())))
+        merged.append(copy)
+        matcher.add(copy, parse_api_time(copy.get('commence_time')))
+        return copy
+    
+    for event in primary:
+        adopt(event, OddsCache.event_id(event))
+    
+    for name, events in feeds:
+        matched = unmatched = 0
+        for event in events:
+            try:
+                home, away = event['home_team'], event['away_team']
+                bookmakers = [bm for bm in event['bookmakers']
+                              if bookmaker_filter.matches(bm['key'], bm.get('title', ''))]
+            except (KeyError, TypeError):
+                continue
+            
+            found = matcher.match(home, away, parse_api_time(event.get('commence_time')))
+            if found is None:
+                unmatched += 1
+                adopt(dict(event, bookmakers=bookmakers), f"{name}:{OddsCache.event_id(event)}")
+                continue
+            
+            matched += 1
+            target, swapped = found
+            names = {home: target['away_team'] if swapped else target['home_team'],
+                     away: target['home_team'] if swapped else target['away_team']}
+            existing = {bm['key']: i for i, bm in enumerate(target['bookmakers'])}
+            for bookmaker in bookmakers:
+                bookmaker = _rename_outcomes(bookmaker, names)
+                index = existing.get(bookmaker['key'])
+                if index is None:
+                    existing[bookmaker['key']] = len(target['bookmakers'])
+                    target['bookmakers'].append(bookmaker)
+                elif _bookmaker_time(bookmaker) > _bookmaker_time(target['bookmakers'][index]):
+                    target['bookmakers'][index] = bookmaker
+        
+        metrics.inc('arb_provider_events_total', matched, provider=name, matched='yes')
+        metrics.inc('arb_provider_events_total', unmatched, provider=name, matched='no')
+    
+    return merged
+
+
+class OddsProvider(ABC):
+    """
+    An extra odds feed. Subclasses implement load(sport), returning events in
+    the Odds API shape; fetch() adds timing and keeps the last good events per sport.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.last_good = {}  # sport -> events
+    
+    def fetch(self, sport: str) -> List[Dict]:
+        with metrics.time('arb_provider_fetch_seconds', provider=self.name):
+            events = self.load(sport)
+        self.last_good[sport] = events
+        return events
+    
+    @abstractmethod
+    def load(self, sport: str) -> List[Dict]:
+        ...
+
+
+def _feed_events(payload) -> List[Dict]:
+    """A feed may send a bare event list or a capture-style {'data': [...]}"""
+    if isinstance(payload, dict):
+        payload = payload.get('data', [])
+    if not isinstance(payload, list):
+        raise ValueError("odds feed did not return a list of events")
+    return payload
+
+
+class FileOddsProvider(OddsProvider):
+    """
+    JSON files on disk, one per sport ('{sport}' in the path), re-read only
+    when they change. Bookmakers without last_update get the file's mtime.
+    """
+    
+    def __init__(self, name: str, path: str):
+        super().__init__(name)
+        self.path = path
+        self.cache = {}  # path -> (mtime, events)
+    
+    def load(self, sport: str) -> List[Dict]:
+        path = self.path.format(sport=sport)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return []  # This feed doesn't cover the sport
+        
+        cached = self.cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        with open(path, 'rb') as f:
+            events = _feed_events(json.load(f))
+        stamp = format_api_time(mtime)
+        for event in events:
+            for bookmaker in event.get('bookmakers', ()):
+                bookmaker.setdefault('last_update', stamp)
+        self.cache[path] = (mtime, events)
+        return events
+
 
-# Statistics
-stats = {
-    'searches': 0,
-    'opportunities_found': 0,
-    'api_calls': 0,
-    'started_at': datetime.now()
+class HttpOddsProvider(OddsProvider):
+    """An HTTP endpoint ('{sport}' in the URL) serving Odds API-shaped JSON"""
+    
+    def __init__(self, name: str, url: str, headers: Optional[Dict] = None, timeout: float = 10):
+        super().__init__(name)
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+    
+    def load(self, sport: str) -> List[Dict]:
+        response = self.session.get(self.url.format(sport=sport), timeout=self.timeout)
+        response.raise_for_status()
+        return _feed_events(response.json())
+
+
+PROVIDER_TYPES = {
+    'file': FileOddsProvider,
+    'http': HttpOddsProvider,
 }
 
+
+def build_providers(specs: List[Dict]) -> List[OddsProvider]:
+    """ODDS_PROVIDERS entries -> provider instances"""
+    providers = []
+    for spec in specs:
+        options = dict(spec)
+        kind = options.pop('type')
+        if kind not in PROVIDER_TYPES:
+            raise ValueError(f"Unknown odds provider type: {kind}")
+        options.setdefault('name', kind)
+        providers.append(PROVIDER_TYPES[kind](**options))
+    return providers
+
 # ============================================================================
 
 class ArbitrageFinder:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_workers: int = FETCH_CONCURRENCY,
+                 dedupe: Optional[DedupeStore] = None, recorder: Optional[SnapshotRecorder] = None,
+                 providers: Optional[List[OddsProvider]] = None):
         self.api_key = api_key
         self.base_url = "https://api.the-odds-api.com/v4"
+        self.max_workers = max_workers
+        
+        # One keep-alive connection pool shared by all fetch workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers * 2)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Individual HTTP attempts, so a sport's original and hedged requests overlap
+        self.attempts = ThreadPoolExecutor(max_workers=max_workers * 2)
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        self.last_good = {}  # sport -> last successful fetch_odds_api result
+        self.hedge_lock = Lock()
+        self.fetches = self.hedges = 0
+        self.odds_cache = OddsCache()
+        self.dedupe = dedupe if dedupe is not None else DedupeStore()
+        self.requests_remaining = None
+        self.recorder = recorder
+        self.bookmaker_filter = BookmakerFilter(KENYAN_BOOKMAKERS)
+        self.providers = build_providers(ODDS_PROVIDERS) if providers is None else providers
+        self.provider_pool = ThreadPoolExecutor(max_workers=max_workers) if self.providers else None
+        self.matchers = {}  # sport -> EventMatcher (keeps learned team aliases)
+        self.hot_set = HotSet() if HOT_SET_SIZE else None
         
+    def get_sports(self) -> List[str]:
+        """In-season sport keys from /sports (free: this endpoint costs no quota)"""
+        try:
+            response = self.session.get(f"{self.base_url}/sports", params={'apiKey': self.api_key}, timeout=15)
+            response.raise_for_status()
+            # Outright-only sports (futures/winner markets) have no h2h to arb
+            return [sport['key'] for sport in response.json()
+                    if sport.get('active') and not sport.get('has_outrights')]
+        except Exception as e:
+            print(f"⚠️  Sports discovery failed: {e}")
+            metrics.inc('arb_fetch_errors_total', sport='_sports', reason=type(e).__name__)
+            return []
+    
     def is_3_way_sport(self, sport_key: str) -> bool:
         return 'soccer' in sport_key.lower() or 'football' in sport_key.lower()
     
-    def get_odds(self, sport: str) -> Dict:
+    def get_odds(self, sport: str, deadline: Optional[float] = None) -> Dict:
+        """A sport's book: the Odds API payload merged with every extra provider's events"""
+        deadline = time.monotonic() + FETCH_DEADLINE if deadline is None else deadline
+        loads = [(provider, self.provider_pool.submit(provider.fetch, sport)) for provider in self.providers]
+        result = self.fetch_odds_api(sport, deadline)
+        
+        if loads:
+            feeds = []
+            fresh = not result.get('stale')
+            for provider, load in loads:
+                try:
+                    feeds.append((provider.name, load.result(timeout=max(deadline - time.monotonic(), 0))))
+                    fresh = True
+                except Exception as e:
+                    print(f"⚠️  {sport} ({provider.name}): {e}")
+                    metrics.inc('arb_provider_errors_total', provider=provider.name)
+                    feeds.append((provider.name, provider.last_good.get(sport, [])))
+            
+            matcher = self.matchers.setdefault(sport, EventMatcher())
+            with metrics.time('arb_match_seconds', sport=sport):
+                data = merge_feeds(sport, result['data'], feeds, matcher, self.bookmaker_filter)
+            result = dict(result, data=data, fetched_at=time.time(), stale=not fresh)
+        
+        if self.recorder and not result.get('stale') and result['data']:
+            self.recorder.record(sport, result['data'], result['fetched_at'])
+        return result
+    
+    def fetch_odds_api(self, sport: str, deadline: Optional[float] = None) -> Dict:
+        """
+        Fetch a sport's odds before `deadline` (time.monotonic(); default FETCH_DEADLINE
+        from now), hedging slow attempts and retrying failed ones. If the sport
+        can't be refreshed, its last good odds come back marked 'stale'.
+        """
         is_3_way = self.is_3_way_sport(sport)
+        deadline = time.monotonic() + FETCH_DEADLINE if deadline is None else deadline
+        
+        # Deadline first: once allow() hands out a half-open trial, the attempt
+        # below must report success or failure or the breaker never closes
+        if deadline - time.monotonic() < 1:
+            return self.fallback(sport, is_3_way, 'deadline')  # queued too long this cycle
+        if not self.breaker.allow(sport):
+            return self.fallback(sport, is_3_way, 'circuit_open')
+        
+        for attempt in range(FETCH_RETRIES + 1):
+            try:
+                filtered_data, headers = self.fetch_hedged(sport, deadline)
+                break
+            except Exception as e:
+                reason = 'timeout' if isinstance(e, (requests.exceptions.Timeout, FetchCancelled)) else type(e).__name__
+                metrics.inc('arb_fetch_errors_total', sport=sport, reason=reason)
+                
+                delay = RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+                if attempt < FETCH_RETRIES and is_retryable(e) and time.monotonic() + delay < deadline - 1:
+                    print(f"⚠️  {sport}: {e} (retrying in {delay:.1f}s)")
+                    metrics.inc('arb_fetch_retries_total', sport=sport)
+                    time.sleep(delay)
+                    continue
+                
+                print(f"⚠️  {sport}: {e}")
+                self.breaker.failure(sport)
+                return self.fallback(sport, is_3_way, reason)
+        
+        self.breaker.success(sport)
+        fetched_at = time.time()
+        bump_stat('api_calls')
+        
+        remaining = headers.get('x-requests-remaining')
+        if remaining is not None:
+            self.requests_remaining = int(float(remaining))
+            metrics.set('arb_api_quota_remaining', self.requests_remaining)
+        used = headers.get('x-requests-used')
+        if used is not None:
+            metrics.set('arb_api_quota_used', float(used))
+        
+        result = {
+            'data': filtered_data,
+            'remaining': remaining,
+            'used': used,
+            'is_3_way': is_3_way,
+            'fetched_at': fetched_at
+        }
+        self.last_good[sport] = result
+        return result
+    
+    def fallback(self, sport: str, is_3_way: bool, reason: str) -> Dict:
+        """The sport's last good odds (unchanged, so nothing is rescanned), or nothing"""
+        last = self.last_good.get(sport)
+        if last is None:
+            return {'data': [], 'remaining': None, 'used': None, 'is_3_way': is_3_way}
+        
+        metrics.inc('arb_fetch_fallbacks_total', sport=sport, reason=reason)
+        print(f"♻️  {sport}: using last good odds from {time.time() - last['fetched_at']:.0f}s ago")
+        return dict(last, remaining=None, used=None, stale=True)
+    
+    def hedge_delay(self, sport: str) -> Optional[float]:
+        """Seconds to wait before hedging this sport's fetch (None: don't hedge)"""
+        p95 = self.latency.percentile(sport, HEDGE_PERCENTILE)
+        return None if p95 is None else max(p95, HEDGE_MIN_DELAY)
+    
+    def take_hedge(self) -> bool:
+        """Every hedge costs quota, so at most HEDGE_BUDGET of fetches get one"""
+        with self.hedge_lock:
+            if self.hedges + 1 > HEDGE_BUDGET * self.fetches:
+                return False
+            self.hedges += 1
+            return True
+    
+    def fetch_hedged(self, sport: str, deadline: float) -> Tuple[List[Dict], Dict]:
+        """
+        One fetch attempt, plus a duplicate request if the first is still running
+        after the sport's p95. Whichever finishes first wins; the other is cancelled.
+        """
+        with self.hedge_lock:
+            self.fetches += 1
+        cancel = Event()
+        attempts = [self.attempts.submit(self.fetch_once, sport, deadline, cancel)]
+        
+        hedge_after = self.hedge_delay(sport)
+        if hedge_after is not None and time.monotonic() + hedge_after < deadline:
+            done, _ = wait(attempts, timeout=hedge_after)
+            if not done and self.take_hedge():
+                metrics.inc('arb_fetch_hedges_total', sport=sport)
+                attempts.append(self.attempts.submit(self.fetch_once, sport, deadline, cancel))
+        
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                cancel.set()
+                raise FetchCancelled(f"no response within the {FETCH_DEADLINE}s fetch deadline")
+            for future in done:
+                if future.exception() is None:
+                    cancel.set()
+                    if future is not attempts[0]:
+                        metrics.inc('arb_fetch_hedge_wins_total', sport=sport)
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def fetch_once(self, sport: str, deadline: float, cancel: Event) -> Tuple[List[Dict], Dict]:
+        """A single /odds request, decoded and filtered as it streams in"""
         url = f"{self.base_url}/sports/{sport}/odds"
         params = {
             'apiKey': self.api_key,
-            'regions': 'uk,eu',
-            'markets': 'h2h',
+            'regions': ODDS_REGIONS,
+            'markets': ODDS_MARKETS,
             'oddsFormat': 'decimal'
         }
         
-        try:
-            response = requests.get(url, params=params, timeout=15)
+        def chunks(response):
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if cancel.is_set():
+                    raise FetchCancelled(f"{sport}: fetch abandoned")
+                yield chunk
+        
+        start = time.perf_counter()
+        timeout = max(min(15, deadline - time.monotonic()), 0.1)
+        response = self.session.get(url, params=params, timeout=timeout, stream=True)
+        with response:
             response.raise_for_status()
-            data = response.json()
-            
-            stats['api_calls'] += 1
-            
-            # Filter for Kenyan bookmakers
-            filtered_data = []
-            for event in data:
-                kenyan_bms = [
-                    bm for bm in event.get('bookmakers', [])
-                    if any(kb.lower() in bm.get('key', '').lower() or 
-                          kb.lower() in bm.get('title', '').lower() 
-                          for kb in KENYAN_BOOKMAKERS)
-                ]
-                
-                if kenyan_bms:
-                    event['bookmakers'] = kenyan_bms
-                    filtered_data.append(event)
+            headers_seconds = time.perf_counter() - start
             
-            return {
-                'data': filtered_data,
-                'remaining': response.headers.get('x-requests-remaining'),
-                'used': response.headers.get('x-requests-used'),
-                'is_3_way': is_3_way
-            }
-        except requests.exceptions.Timeout:
-            print(f"⚠️  {sport}: Connection timeout (retrying next cycle)")
-            return {'data': [], 'remaining': None, 'used': None, 'is_3_way': is_3_way}
+            # Decode the body event by event as it streams in, dropping non-Kenyan bookmakers
+            parser = OddsStreamParser(self.bookmaker_filter)
+            parse_start = time.perf_counter()
+            filtered_data = list(parser.iter_events(chunks(response)))
+            parse_seconds = time.perf_counter() - parse_start
+        
+        self.latency.record(sport, time.perf_counter() - start)
+        metrics.observe('arb_fetch_seconds', headers_seconds + parser.read_seconds, sport=sport)
+        metrics.observe('arb_decode_seconds',
+                        parse_seconds - parser.read_seconds - parser.filter_seconds, sport=sport)
+        metrics.observe('arb_filter_seconds', parser.filter_seconds, sport=sport)
+        return filtered_data, response.headers
+    
+    def get_event_odds(self, sport: str, event_id: str) -> Optional[Dict]:
+        """
+        One event's Odds API quotes (Kenyan bookmakers only), None on error, or
+        {'gone': True} once it started or was withdrawn. Runs on pool threads,
+        so the caller drops gone events from the (unlocked) hot set itself.
+        """
+        url = f"{self.base_url}/sports/{sport}/events/{event_id}/odds"
+        params = {
+            'apiKey': self.api_key,
+            'regions': ODDS_REGIONS,
+            'markets': ODDS_MARKETS,
+            'oddsFormat': 'decimal'
+        }
+        
+        try:
+            with metrics.time('arb_fetch_seconds', sport=sport):
+                response = self.session.get(url, params=params, timeout=10)
+            if response.status_code in (404, 422):
+                return {'gone': True}  # Started or withdrawn
+            response.raise_for_status()
+            event = response.json()
         except Exception as e:
-            print(f"⚠️  {sport}: {e}")
-            return {'data': [], 'remaining': None, 'used': None, 'is_3_way': is_3_way}
+            print(f"⚠️  {sport} event {event_id}: {e}")
+            metrics.inc('arb_fetch_errors_total', sport=sport, reason=type(e).__name__)
+            return None
+        
+        bump_stat('api_calls')
+        metrics.inc('arb_hot_polls_total', sport=sport)
+        remaining = response.headers.get('x-requests-remaining')
+        if remaining is not None:
+            self.requests_remaining = int(float(remaining))
+            metrics.set('arb_api_quota_remaining', self.requests_remaining)
+        
+        event['bookmakers'] = [bm for bm in event.get('bookmakers', ())
+                               if self.bookmaker_filter.matches(bm['key'], bm.get('title', ''))]
+        return event
     
     def calculate_arbitrage(self, odds_list: List[float]) -> Dict:
         if not odds_list or any(o <= 1 for o in odds_list):
@@ -188,96 +2364,219 @@ class ArbitrageFinder:
         return [(total_stake / implied_prob_sum) / odd for odd in odds_list]
     
     def find_arbitrage_opportunities(self, sport: str, total_stake: float = 1000) -> List[Dict]:
-        result = self.get_odds(sport)
+        return self.accept(self.scan_odds(sport, self.get_odds(sport), total_stake))
+    
+    def find_arbitrage_concurrently(self, sports: List[str], total_stake: float = 1000,
+                                    idle: Optional[float] = None) -> Iterator[Tuple[Optional[str], List[Dict]]]:
+        """
+        Fetch all sports in parallel, yielding each sport's opportunities as soon as its odds arrive.
+        With `idle`, (None, []) is yielded whenever that many seconds pass without a sport finishing.
+        """
+        deadline = time.monotonic() + FETCH_DEADLINE
+        futures = {self.executor.submit(self.get_odds, sport, deadline): sport for sport in sports}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=idle, return_when=FIRST_COMPLETED)
+            if not done:
+                yield None, []
+            for future in done:
+                sport = futures[future]
+                yield sport, self.scan_odds(sport, future.result(), total_stake)
+    
+    def scan_odds(self, sport: str, result: Dict, total_stake: float = 1000) -> List[Dict]:
+        """Scan a fetched payload: stream every change, return the arbs found on rescanned events"""
+        scanned, opportunities = self.scan_changed(sport, result, total_stake)
+        live_stream.track(opportunities, scanned)
+        return opportunities
+    
+    def scan_changed(self, sport: str, result: Dict, total_stake: float = 1000) -> Tuple[List[str], List[Dict]]:
+        """(ids of the events rescanned, every arb found on them)"""
         events = result['data']
         is_3_way = result['is_3_way']
         
         if not events:
+            return [], []
+        
+        # Only events whose quotes moved since the last poll need rescanning
+        events = self.odds_cache.update(sport, events, now=result.get('fetched_at'))
+        
+        with metrics.time('arb_scan_seconds', sport=sport):
+            arbs = self.find_arbs(events, is_3_way, total_stake)
+        if self.hot_set is not None:
+            self.hot_set.update(sport, events, result['data'], is_3_way)
+        
+        return ([event.id for event in events],
+                [self.build_opportunity(sport, arb, total_stake, is_3_way) for arb in arbs])
+    
+    def scan_event(self, sport: str, event: Dict, is_3_way: bool, total_stake: float = 1000) -> List[Dict]:
+        """scan_odds for a single refreshed event (hot-set polls)"""
+        quotes = self.odds_cache.update_event(sport, event)
+        if quotes is None:
             return []
         
-        opportunities = []
+        with metrics.time('arb_scan_seconds', sport=sport):
+            arbs = self.find_arbs([quotes], is_3_way, total_stake)
+        if self.hot_set is not None:
+            self.hot_set.update(sport, [quotes], [event], is_3_way, complete=False)
+        
+        opportunities = [self.build_opportunity(sport, arb, total_stake, is_3_way) for arb in arbs]
+        live_stream.track(opportunities, [quotes.id])
+        return opportunities
+    
+    def accept(self, opportunities: List[Dict]) -> List[Dict]:
+        """Record opportunities as alerted, dropping the ones that already were"""
+        fresh = []
+        for opp in opportunities:
+            if not self.dedupe.should_alert(opp['key'], opp['profit_percent'],
+                                            parse_api_time(opp['commence_time'])):
+                continue  # Already alerted about this
+            
+            bump_stat('opportunities_found')
+            fresh.append(opp)
+        return fresh
+    
+    def find_arbs(self, events: List[EventQuotes], is_3_way: bool, total_stake: float = 1000,
+                  min_profit: float = MIN_PROFIT_PERCENT, now: Optional[float] = None) -> List[Opportunity]:
+        """
+        An Opportunity for every event market line whose best prices beat min_profit.
+        Quotes older than MAX_QUOTE_AGE at `now` are left out; an outcome with
+        only stale quotes counts as missing.
+        """
+        now = time.time() if now is None else now
+        if USE_NUMPY_SCANNER and np is not None:
+            return scan_batch(events, is_3_way, total_stake, min_profit, now)
+        
+        arbs = []
+        cutoff = now - MAX_QUOTE_AGE if MAX_QUOTE_AGE else None
+        stale_quotes = 0
         
         for event in events:
-            try:
-                home_team = event['home_team']
-                away_team = event['away_team']
-                commence_time = event['commence_time']
-                event_id = event.get('id', f"{home_team}_{away_team}")
+            prices = event.prices
+            updated = event.quote_updated
+            cell_starts = event.cell_starts
+            line_starts = event.line_starts
+            
+            # Zero out stale prices; a zero never wins a cell
+            if cutoff is not None and prices and min(updated) < cutoff:
+                prices = array('d', [p if u >= cutoff else 0.0 for p, u in zip(prices, updated)])
+                stale_quotes += prices.count(0.0)
+            
+            closest = float('inf')
+            for line, (market_key, point) in enumerate(event.lines):
+                first, last = line_starts[line], line_starts[line + 1]
+                if last - first < required_outcomes(market_key, is_3_way):
+                    continue
                 
-                best_odds = {}
-                bookmaker_info = {}
-                bookmaker_keys = {}
+                # Best price per outcome; the first bookmaker quoting it wins ties
+                odds_values = []
+                winners = []
+                quote_times = []
+                outcomes = []
+                for cell in range(first, last):
+                    start = cell_starts[cell]
+                    quotes = prices[start:cell_starts[cell + 1]]
+                    best = max(quotes)
+                    if best == 0:
+                        continue
+                    index = start + quotes.index(best)
+                    odds_values.append(best)
+                    winners.append(event.bookmakers[event.quote_bookmakers[index]])
+                    quote_times.append(updated[index])
+                    outcomes.append(event.cell_outcomes[cell])
                 
-                for bookmaker in event['bookmakers']:
-                    bookmaker_name = bookmaker['title']
-                    bookmaker_key = bookmaker['key']
-                    
-                    for market in bookmaker['markets']:
-                        if market['key'] == 'h2h':
-                            for outcome in market['outcomes']:
-                                outcome_name = outcome['name']
-                                odds = outcome['price']
-                                
-                                if outcome_name not in best_odds or odds > best_odds[outcome_name]:
-                                    best_odds[outcome_name] = odds
-                                    bookmaker_info[outcome_name] = bookmaker_name
-                                    bookmaker_keys[outcome_name] = bookmaker_key
+                if len(odds_values) < required_outcomes(market_key, is_3_way):
+                    continue
                 
-                required_outcomes = 3 if is_3_way else 2
+                arb_result = self.calculate_arbitrage(odds_values)
+                if arb_result['exists']:
+                    closest = min(closest, arb_result['implied_prob_sum'])
+                elif min(odds_values) > 1:
+                    closest = min(closest, sum(1 / odd for odd in odds_values))
                 
-                if len(best_odds) >= required_outcomes:
-                    odds_values = list(best_odds.values())
-                    arb_result = self.calculate_arbitrage(odds_values)
-                    
-                    if arb_result['exists'] and arb_result['profit_percent'] >= MIN_PROFIT_PERCENT:
-                        # Create unique ID to avoid duplicate alerts
-                        opp_id = f"{event_id}_{arb_result['profit_percent']:.1f}"
-                        
-                        if opp_id in seen_opportunities:
-                            continue  # Already alerted about this
-                        
-                        seen_opportunities.add(opp_id)
-                        stats['opportunities_found'] += 1
-                        
-                        stakes = self.calculate_stakes(total_stake, odds_values)
-                        guaranteed_return = stakes[0] * odds_values[0]
-                        profit = guaranteed_return - total_stake
-                        
-                        opportunity = {
-                            'sport': sport,
-                            'sport_name': self.get_sport_display_name(sport),
-                            'home_team': home_team,
-                            'away_team': away_team,
-                            'commence_time': commence_time,
-                            'profit_percent': round(arb_result['profit_percent'], 2),
-                            'profit_amount': round(profit, 2),
-                            'total_stake': total_stake,
-                            'guaranteed_return': round(guaranteed_return, 2),
-                            'is_3_way': is_3_way,
-                            'bets': []
-                        }
-                        
-                        for i, (outcome, odds) in enumerate(best_odds.items()):
-                            bet_type = self.get_bet_type_display(outcome, home_team, away_team, is_3_way)
-                            bookmaker_key = bookmaker_keys[outcome]
-                            bookmaker_url = BOOKMAKER_URLS.get(bookmaker_key, '#')
-                            
-                            opportunity['bets'].append({
-                                'outcome': outcome,
-                                'bet_type': bet_type,
-                                'bookmaker': bookmaker_info[outcome],
-                                'bookmaker_url': bookmaker_url,
-                                'odds': round(odds, 2),
-                                'stake': round(stakes[i], 2),
-                                'return': round(stakes[i] * odds, 2)
-                            })
-                        
-                        opportunities.append(opportunity)
-                        
-            except (KeyError, IndexError):
-                continue
+                if arb_result['exists'] and arb_result['profit_percent'] >= min_profit:
+                    arbs.append(Opportunity(
+                        event, market_key, point, arb_result['profit_percent'],
+                        arb_result['implied_prob_sum'], outcomes, odds_values, winners,
+                        self.calculate_stakes(total_stake, odds_values), quote_times
+                    ))
+            event.closest = closest
         
-        return opportunities
+        if stale_quotes:
+            metrics.inc('arb_stale_quotes_total', stale_quotes)
+        return arbs
+    
+    def build_opportunity(self, sport: str, arb: Opportunity, total_stake: float,
+                          is_3_way: bool) -> Dict:
+        """Turn a scan record into the alert/display dict"""
+        event = arb.event
+        home_team = event.home_team
+        away_team = event.away_team
+        odds_values = arb.odds
+        stakes = arb.stakes
+        
+        guaranteed_return = stakes[0] * odds_values[0]
+        profit = guaranteed_return - total_stake
+        market, point = arb.market, arb.point
+        is_3_way = required_outcomes(market, is_3_way) == 3
+        
+        opportunity = {
+            'key': arb.key,
+            'event_id': event.id,
+            'sport': sport,
+            'sport_name': self.get_sport_display_name(sport),
+            'home_team': home_team,
+            'away_team': away_team,
+            'commence_time': event.commence_time,
+            'profit_percent': round(arb.profit_percent, 2),
+            'profit_amount': round(profit, 2),
+            'total_stake': total_stake,
+            'guaranteed_return': round(guaranteed_return, 2),
+            'is_3_way': is_3_way,
+            'market': market,
+            'point': point,
+            'market_name': market_display_name(market, point),
+            'timestamps': self.opportunity_timestamps(arb),
+            'bets': []
+        }
+        
+        for i, (outcome_id, odds, bookmaker_id) in enumerate(zip(arb.outcomes, odds_values, arb.bookmakers)):
+            outcome = OUTCOME_IDS.name(outcome_id)
+            bet_type = self.get_bet_type_display(outcome, home_team, away_team, is_3_way, market, point)
+            bookmaker_key = BOOKMAKER_IDS.name(bookmaker_id)
+            bookmaker_url = BOOKMAKER_URLS.get(bookmaker_key, '#')
+            
+            opportunity['bets'].append({
+                'outcome': outcome,
+                'bet_type': bet_type,
+                'bookmaker_key': bookmaker_key,
+                'bookmaker': BOOKMAKER_TITLES.get(bookmaker_id, bookmaker_key),
+                'bookmaker_url': bookmaker_url,
+                'odds': round(odds, 2),
+                'price': odds,
+                'stake': round(stakes[i], 2),
+                'return': round(stakes[i] * odds, 2)
+            })
+        
+        return opportunity
+    
+    @staticmethod
+    def opportunity_timestamps(arb: Opportunity) -> Dict:
+        """
+        Epoch seconds along the way from bookmaker to alert. The arb exists from
+        the moment its newest price appeared (quote_updated); oldest_quote bounds
+        how stale the other legs are. 'sent' is filled in by the dispatcher.
+        """
+        known = [t for t in arb.quote_times if t != float('inf')]
+        timestamps = {
+            'quote_updated': max(known) if known else None,
+            'oldest_quote': min(known) if known else None,
+            'fetched': arb.event.fetched_at,
+            'scanned': arb.scanned_at,
+            'sent': None,
+        }
+        if known:
+            metrics.observe('arb_quote_age_seconds', max(arb.scanned_at - min(known), 0))
+        return timestamps
     
     def get_sport_display_name(self, sport_key: str) -> str:
         names = {
@@ -292,7 +2591,14 @@ class ArbitrageFinder:
         }
         return names.get(sport_key, sport_key.upper())
     
-    def get_bet_type_display(self, outcome: str, home: str, away: str, is_3_way: bool) -> str:
+    def get_bet_type_display(self, outcome: str, home: str, away: str, is_3_way: bool,
+                             market: str = 'h2h', point: Optional[float] = None) -> str:
+        if market == 'totals' and point is not None:
+            return f"{outcome} {point:g}"
+        if market == 'spreads' and point is not None:
+            line = point if outcome == home else -point
+            return f"{outcome} {line:+g}"
+        
         if not is_3_way:
             if outcome == home:
                 return f"{home} Win"
@@ -309,13 +2615,121 @@ class ArbitrageFinder:
             return outcome
 
 
+class StakeAllocator:
+    """
+    Sizes the arbs found in a polling cycle out of one bankroll.
+    A batch is allocated greedily by profit rate (1 / implied sum - 1):
+    an arb gets as much stake as is left in the bankroll, its bookmakers'
+    balances and MAX_STAKE_KES allow. Stakes are then rounded to each
+    bookmaker's increment, choosing the floor/ceil mix with the best
+    guaranteed profit that still fits. Hot-set rounds draw on what the
+    cycle left; budgets reset at the next cycle. Arbs that didn't fit are
+    kept in `unfunded` so they can be offered again.
+    """
+    
+    def __init__(self, bankroll: float = BANKROLL_KES, balances: Optional[Dict[str, float]] = None,
+                 max_stake: float = MAX_STAKE_KES, increment: float = STAKE_INCREMENT,
+                 increments: Optional[Dict[str, float]] = None):
+        self.bankroll = bankroll
+        self.balances = BOOKMAKER_BALANCES if balances is None else balances
+        self.max_stake = max_stake
+        self.increment = increment
+        self.increments = BOOKMAKER_STAKE_INCREMENTS if increments is None else increments
+        self.unfunded = {}  # key -> opportunity skipped by the last allocate()
+        self.start_cycle()
+    
+    def start_cycle(self):
+        self.bankroll_left = self.bankroll
+        self.balances_left = dict(self.balances)
+    
+    def _round(self, target: float, bets: List[Dict]) -> Optional[List[float]]:
+        """Best whole-increment stakes near the ideal split of `target`, or None if none profit"""
+        implied_prob_sum = sum(1 / bet['price'] for bet in bets)
+        choices = []
+        for bet in bets:
+            step = self.increments.get(bet['bookmaker_key'], self.increment)
+            ideal = target / implied_prob_sum / bet['price']
+            low = math.floor(ideal / step) * step
+            choices.append({low, low + step} - {0})
+        
+        best, best_profit = None, 0.0
+        for stakes in itertools.product(*choices):
+            total = sum(stakes)
+            if total > self.bankroll_left + 1e-9 or total > self.max_stake + 1e-9:
+                continue
+            spent = {}
+            for bet, stake in zip(bets, stakes):
+                spent[bet['bookmaker_key']] = spent.get(bet['bookmaker_key'], 0) + stake
+            if any(amount > self.balances_left.get(key, float('inf')) + 1e-9 for key, amount in spent.items()):
+                continue
+            profit = min(stake * bet['price'] for stake, bet in zip(stakes, bets)) - total
+            if profit > best_profit + 1e-9 or (best is not None and abs(profit - best_profit) <= 1e-9
+                                               and total < sum(best)):
+                best, best_profit = list(stakes), profit
+        return best
+    
+    def allocate(self, opportunities: List[Dict]) -> List[Dict]:
+        """Sized copies of the batch's opportunities that got funded, best first (the originals are left as found)"""
+        # Lowest implied sum = highest profit per KES staked
+        ranked = sorted(opportunities, key=lambda opp: sum(1 / bet['price'] for bet in opp['bets']))
+        funded = []
+        self.unfunded = {}
+        
+        for opp in ranked:
+            bets = opp['bets']
+            implied_prob_sum = sum(1 / bet['price'] for bet in bets)
+            
+            # Largest total stake every budget allows; a bookmaker's legs draw on its balance together
+            target = min(self.max_stake, self.bankroll_left)
+            shares = {}
+            for bet in bets:
+                shares[bet['bookmaker_key']] = shares.get(bet['bookmaker_key'], 0) + 1 / implied_prob_sum / bet['price']
+            for key, share in shares.items():
+                target = min(target, self.balances_left.get(key, float('inf')) / share)
+            
+            stakes = self._round(target, bets) if target > 0 else None
+            if stakes is None:
+                self.unfunded[opp['key']] = opp
+                continue
+            
+            # The scan's dicts are shared with the live stream, so stakes go on a copy
+            bets = [dict(bet) for bet in bets]
+            opp = dict(opp, bets=bets)
+            if 'timestamps' in opp:
+                opp['timestamps'] = dict(opp['timestamps'])  # the dispatcher stamps 'sent' on it
+            total = sum(stakes)
+            self.bankroll_left -= total
+            for bet, stake in zip(bets, stakes):
+                if bet['bookmaker_key'] in self.balances_left:
+                    self.balances_left[bet['bookmaker_key']] -= stake
+                bet['stake'] = stake
+                bet['return'] = round(stake * bet['price'], 2)
+            
+            guaranteed_return = min(bet['return'] for bet in bets)
+            opp['total_stake'] = total
+            opp['guaranteed_return'] = guaranteed_return
+            opp['profit_amount'] = round(guaranteed_return - total, 2)
+            funded.append(opp)
+        
+        if self.unfunded:
+            best = max(opp['profit_percent'] for opp in self.unfunded.values())
+            print(f"💸 {len(self.unfunded)} arb(s) up to {best}% didn't fit what's left of the bankroll/balances "
+                  f"(offered again next round)")
+        return funded
+
+
 class TelegramNotifier:
     def __init__(self, bot_token: str, chat_id: str):
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.base_url = f"https://api.telegram.org/bot{bot_token}"
+        self.session = requests.Session()
     
     def send_message(self, text: str, disable_preview: bool = True) -> bool:
+        return self.deliver(text, disable_preview)[0]
+    
+    def deliver(self, text: str, disable_preview: bool = True) -> Tuple[bool, Optional[float]]:
+        """Send a message, returning (sent, retry_after seconds if Telegram throttled us)"""
         try:
             url = f"{self.base_url}/sendMessage"
             payload = {
@@ -324,20 +2738,29 @@ class TelegramNotifier:
                 'parse_mode': 'HTML',
                 'disable_web_page_preview': disable_preview
             }
-            response = requests.post(url, json=payload, timeout=10)
-            return response.status_code == 200
+            response = self.session.post(url, json=payload, timeout=10)
+            if response.status_code == 429:
+                try:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                except ValueError:
+                    retry_after = 1
+                return False, float(retry_after)
+            return response.status_code == 200, None
         except requests.exceptions.Timeout:
             print("⚠️  Telegram timeout - message not sent")
-            return False
+            return False, None
         except Exception as e:
             print(f"Telegram error: {e}")
-            return False
+            return False, None
     
     def format_opportunity(self, opp: Dict) -> str:
         bet_type = "3-WAY" if opp['is_3_way'] else "2-WAY"
         
         msg = f"🚨 <b>ARBITRAGE ALERT!</b> 🚨\n"
-        msg += f"⚡ <b>{bet_type}</b> | {opp['sport_name']}\n\n"
+        msg += f"⚡ <b>{bet_type}</b> | {opp['sport_name']}"
+        if opp.get('market', 'h2h') != 'h2h':
+            msg += f" | {opp['market_name']}"
+        msg += "\n\n"
         
         msg += f"⚽ <b>{opp['home_team']} vs {opp['away_team']}</b>\n\n"
         
@@ -346,7 +2769,11 @@ class TelegramNotifier:
         msg += f"✅ Return: KES {opp['guaranteed_return']}\n\n"
         
         msg += "🎯 <b>QUICK ACTION REQUIRED!</b>\n"
-        msg += "⏱️ <i>Odds may change in 2-5 minutes</i>\n\n"
+        msg += "⏱️ <i>Odds may change in 2-5 minutes</i>\n"
+        oldest = opp.get('timestamps', {}).get('oldest_quote')
+        if oldest:
+            msg += f"🕒 <i>Oldest price updated {max(time.time() - oldest, 0):.0f}s ago</i>\n"
+        msg += "\n"
         
         msg += "=" * 30 + "\n"
         msg += "📋 <b>PLACE THESE BETS:</b>\n"
@@ -393,6 +2820,118 @@ class TelegramNotifier:
         return self.send_message(msg)
 
 
+class TokenBucket:
+    """Simple thread-safe token bucket: `rate` tokens/second, bursts up to `capacity`"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Hold all sends for `seconds` (Telegram 429 retry_after)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class AlertDispatcher:
+    """
+    Background Telegram sender, decoupled from the scan loop.
+    Alerts wait in a priority queue (highest profit_percent first) and are
+    sent through a token bucket matched to Telegram's per-chat limit.
+    429s pause the bucket for `retry_after` and requeue the alert.
+    """
+    
+    def __init__(self, notifier: TelegramNotifier, rate: float = TELEGRAM_RATE_PER_SEC,
+                 burst: int = TELEGRAM_BURST, max_attempts: int = 3):
+        self.notifier = notifier
+        self.bucket = TokenBucket(rate, burst)
+        self.max_attempts = max_attempts
+        self.queue = PriorityQueue()
+        self.sequence = itertools.count()  # FIFO among equal profits
+        self.thread = Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def submit(self, opp: Dict):
+        self.queue.put((-opp['profit_percent'], next(self.sequence), opp, 1))
+        metrics.set('arb_alert_queue_depth', self.queue.qsize())
+    
+    def pending(self) -> int:
+        return self.queue.qsize()
+    
+    def stop(self, timeout: float = 10):
+        """Send whatever is queued (up to timeout), then stop the worker"""
+        self.queue.put((float('inf'), next(self.sequence), None, 0))
+        self.thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            priority, seq, opp, attempt = self.queue.get()
+            if opp is None:
+                break
+            
+            self.bucket.acquire()
+            with metrics.time('arb_format_seconds'):
+                message = self.notifier.format_opportunity(opp)
+            with metrics.time('arb_telegram_send_seconds'):
+                sent, retry_after = self.notifier.deliver(message)
+            
+            if sent:
+                self._record_latency(opp, time.time())
+                metrics.inc('arb_alerts_sent_total')
+                print(f"📱 Alert sent: {opp['home_team']} vs {opp['away_team']} (KES {opp['profit_amount']})")
+            elif retry_after is not None:
+                print(f"⏳ Telegram rate limit, retrying in {retry_after:.0f}s")
+                self.bucket.pause(retry_after)
+                self.queue.put((priority, seq, opp, attempt))
+            elif attempt < self.max_attempts:
+                self.queue.put((priority, seq, opp, attempt + 1))
+            else:
+                metrics.inc('arb_alerts_failed_total')
+                print(f"❌ Failed to send alert")
+            metrics.set('arb_alert_queue_depth', self.queue.qsize())
+    
+    @staticmethod
+    def _record_latency(opp: Dict, sent_at: float):
+        """Stamp the send time and feed the time-to-alert histograms, stage by stage"""
+        timestamps = opp.get('timestamps')
+        if not timestamps:
+            return
+        timestamps['sent'] = sent_at
+        sport = opp['sport']
+        updated, fetched, scanned = timestamps['quote_updated'], timestamps['fetched'], timestamps['scanned']
+        
+        if updated is not None:
+            metrics.observe('arb_quote_to_fetch_seconds', max(fetched - updated, 0), sport=sport)
+            metrics.observe('arb_time_to_alert_seconds', max(sent_at - updated, 0), sport=sport)
+        metrics.observe('arb_fetch_to_scan_seconds', max(scanned - fetched, 0), sport=sport)
+        metrics.observe('arb_scan_to_send_seconds', max(sent_at - scanned, 0), sport=sport)
+
+
 def is_active_hours() -> bool:
     """Check if currently in active hours"""
     if ACTIVE_START_HOUR == 0 and ACTIVE_END_HOUR == 0:
@@ -408,14 +2947,480 @@ def get_todays_sports() -> List[str]:
     return DAILY_SPORTS.get(today, ["basketball_nba", "icehockey_nhl"])
 
 
-def monitor_arbitrage(finder: ArbitrageFinder, notifier: Optional[TelegramNotifier]):
+def active_seconds_until_quota_reset(now: Optional[datetime] = None) -> float:
+    """Seconds of active hours left before the monthly API quota resets"""
+    now = now or datetime.now()
+    year, month = now.year, now.month
+    if now.day >= QUOTA_RESET_DAY:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    reset = datetime(year, month, QUOTA_RESET_DAY)
+    
+    seconds = (reset - now).total_seconds()
+    if ACTIVE_START_HOUR != 0 or ACTIVE_END_HOUR != 0:
+        seconds *= (ACTIVE_END_HOUR - ACTIVE_START_HOUR) / 24
+    return max(seconds, 1.0)
+
+
+class PollScheduler:
+    """
+    Adaptive per-sport polling.
+    The remaining API quota is spread evenly over the active hours left
+    until it resets, and that budget is shared between sports by weight:
+    sports with events close to kickoff and odds that moved recently are
+    polled more often, quiet leagues less.
+    """
+    
+    def __init__(self, credits_per_poll: int = 1, min_interval: float = MIN_POLL_INTERVAL,
+                 max_interval: float = MAX_POLL_INTERVAL, default_interval: float = CHECK_INTERVAL,
+                 quota_share: float = 1.0):
+        self.credits_per_poll = credits_per_poll
+        self.quota_share = quota_share  # the rest is left for hot-set polling
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.remaining = None
+        # sport -> {'next_due', 'volatility', 'near_kickoff'}
+        self.sports = {}
+    
+    def _state(self, sport: str) -> Dict:
+        if sport not in self.sports:
+            self.sports[sport] = {'next_due': 0.0, 'volatility': 1.0, 'near_kickoff': 0}
+        return self.sports[sport]
+    
+    def weight(self, sport: str) -> float:
+        state = self._state(sport)
+        return (1 + state['near_kickoff']) * (0.25 + state['volatility'])
+    
+    def update_quota(self, remaining: Optional[int]):
+        if remaining is not None:
+            self.remaining = remaining
+    
+    def interval(self, sport: str, sports: List[str]) -> float:
+        """Seconds until `sport` should be polled again"""
+        if self.remaining is None:
+            return self.default_interval
+        
+        # Polls per second we can afford for the rest of the quota period
+        affordable = self.remaining * self.quota_share / self.credits_per_poll / active_seconds_until_quota_reset()
+        if affordable <= 0:
+            return self.max_interval
+        
+        sports = list(dict.fromkeys(sports + [sport]))
+        weights = {s: self.weight(s) for s in sports}
+        total_weight = sum(weights.values())
+        intervals = {
+            s: min(self.max_interval, max(self.min_interval, total_weight / (affordable * w)))
+            for s, w in weights.items()
+        }
+        
+        # Clamping can overspend; the quota budget always wins over max_interval
+        rate = sum(1 / i for i in intervals.values())
+        return intervals[sport] * max(1.0, rate / affordable)
+    
+    def record_poll(self, sport: str, sports: List[str], changed: int, total: int,
+                    near_kickoff: int, now: Optional[float] = None):
+        """Update a sport's activity after a poll and schedule its next one"""
+        now = time.time() if now is None else now
+        state = self._state(sport)
+        changed_share = changed / total if total else 0.0
+        state['volatility'] += VOLATILITY_SMOOTHING * (changed_share - state['volatility'])
+        state['near_kickoff'] = near_kickoff
+        state['next_due'] = now + self.interval(sport, sports)
+    
+    def due(self, sports: List[str], now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        return [s for s in sports if self._state(s)['next_due'] <= now]
+    
+    def seconds_until_next(self, sports: List[str], now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        if not sports:
+            return self.default_interval
+        return max(0.0, min(self._state(s)['next_due'] for s in sports) - now)
+
+
+class HotSet:
+    """
+    Events whose best implied-probability sum is within `margin` of an arb
+    (or past it), closest first, capped at `size`. Kept up to date by every
+    scan, with the raw event so a single-event poll can be laid over it.
+    """
+    
+    def __init__(self, margin: float = HOT_MARGIN, size: int = HOT_SET_SIZE):
+        self.margin = margin
+        self.size = size
+        # event_id -> {'sport', 'is_3_way', 'closest', 'commence_ts', 'event'}
+        self.entries = {}
+    
+    def update(self, sport: str, scanned: List[EventQuotes], payload: List[Dict],
+               is_3_way: bool, complete: bool = True):
+        """Fold in a scan; `complete` payloads are the sport's whole feed, so absent events leave"""
+        threshold = 1 + self.margin
+        closest = {}
+        for quotes in scanned:
+            # '<feed>:' events aren't on the Odds API, so they can't be polled
+            if quotes.closest < threshold and ':' not in quotes.id:
+                closest[quotes.id] = quotes
+            else:
+                self.entries.pop(quotes.id, None)
+        
+        present = set()
+        for event in payload:
+            event_id = OddsCache.event_id(event)
+            present.add(event_id)
+            quotes = closest.get(event_id)
+            if quotes is not None:
+                self.entries[event_id] = {'sport': sport, 'is_3_way': is_3_way, 'closest': quotes.closest,
+                                          'commence_ts': quotes.commence_ts, 'event': event}
+            elif event_id in self.entries:
+                self.entries[event_id]['event'] = event  # Unchanged, but the newest copy
+        
+        if complete:
+            for event_id in [eid for eid, entry in self.entries.items()
+                             if entry['sport'] == sport and eid not in present]:
+                del self.entries[event_id]
+        
+        for event_id in [entry[0] for entry in self.ranked()[self.size:]]:
+            del self.entries[event_id]
+        metrics.set('arb_hot_events', len(self.entries))
+    
+    def discard(self, event_id: str):
+        self.entries.pop(event_id, None)
+    
+    def ranked(self, now: Optional[float] = None) -> List[Tuple[str, Dict]]:
+        """(event_id, entry) closest first; started events are dropped"""
+        now = time.time() if now is None else now
+        for event_id in [eid for eid, entry in self.entries.items()
+                         if entry['commence_ts'] is not None and entry['commence_ts'] <= now]:
+            del self.entries[event_id]
+        return sorted(self.entries.items(), key=lambda item: item[1]['closest'])
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+class HotPoller:
+    """
+    Fast path for the hot set: each round re-polls the events closest to an
+    arb through /events/{id}/odds and scans every response as it arrives.
+    Rounds are sized and spaced so they spend at most `quota_share` of the
+    quota left until it resets.
+    """
+    
+    def __init__(self, finder: 'ArbitrageFinder', credits_per_poll: int = 1,
+                 interval: float = HOT_POLL_INTERVAL, quota_share: float = HOT_QUOTA_SHARE):
+        self.finder = finder
+        self.credits_per_poll = credits_per_poll
+        self.interval = interval
+        self.quota_share = quota_share
+        self.next_due = 0.0
+    
+    def plan(self) -> Tuple[int, float]:
+        """(events per round, seconds between rounds) affordable right now"""
+        remaining = self.finder.requests_remaining
+        if remaining is None:
+            return 0, self.interval  # No quota reading yet
+        
+        affordable = remaining * self.quota_share / self.credits_per_poll / active_seconds_until_quota_reset()
+        if affordable <= 0:
+            return 0, MAX_POLL_INTERVAL
+        round_interval = max(self.interval, 1 / affordable)
+        return max(1, int(affordable * round_interval)), round_interval
+    
+    def due(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return len(self.finder.hot_set) > 0 and now >= self.next_due
+    
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        if not len(self.finder.hot_set):
+            return float('inf')
+        return max(0.0, self.next_due - now)
+    
+    def poll(self, total_stake: float) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (sport, opportunities) per hot event, as each response comes back"""
+        count, round_interval = self.plan()
+        self.next_due = time.time() + round_interval
+        targets = self.finder.hot_set.ranked()[:count]
+        if targets:
+            print(f"🔥 [{datetime.now().strftime('%H:%M:%S')}] Re-polling {len(targets)} near-arb event(s)")
+        
+        futures = {self.finder.executor.submit(self.finder.get_event_odds, entry['sport'], event_id): (event_id, entry)
+                   for event_id, entry in targets}
+        for future in as_completed(futures):
+            event_id, entry = futures[future]
+            fresh = future.result()
+            if fresh is None:
+                continue
+            if fresh.get('gone'):
+                self.finder.hot_set.discard(event_id)  # Here, not on the pool thread: HotSet has no lock
+                continue
+            
+            # Fresh Odds API bookmakers replace theirs; other feeds' stay until the next full poll
+            event = entry['event']
+            keys = {bm['key'] for bm in fresh['bookmakers']}
+            event = dict(event, commence_time=fresh.get('commence_time', event.get('commence_time')),
+                         bookmakers=fresh['bookmakers'] + [bm for bm in event['bookmakers'] if bm['key'] not in keys])
+            yield entry['sport'], self.finder.scan_event(entry['sport'], event, entry['is_3_way'], total_stake)
+
+
+# ============================================================================
+# SHARDED SCANNING (multi-process)
+# ============================================================================
+
+def shard_worker(worker_id: int, api_key: str, base_url: str, tasks, results,
+                 snapshot_dir: Optional[str] = None):
+    """
+    Worker process: fetch + scan one sport at a time with its own session,
+    OddsCache and parser. Dedupe and alerts stay with the coordinator.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the coordinator decides when to stop
+    recorder = SnapshotRecorder(snapshot_dir).start() if snapshot_dir else None
+    finder = ArbitrageFinder(api_key, max_workers=1, recorder=recorder)
+    finder.base_url = base_url
+    
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        sequence, sport, total_stake = task
+        
+        try:
+            scanned, opportunities = finder.scan_changed(sport, finder.get_odds(sport), total_stake)
+        except Exception as e:
+            print(f"⚠️  {sport}: {e}")
+            scanned, opportunities = [], []
+        
+        changed, total = finder.odds_cache.activity.get(sport, (0, 0))
+        results.put({
+            'worker': worker_id,
+            'sequence': sequence,
+            'sport': sport,
+            'opportunities': opportunities,
+            'scanned': scanned,
+            'activity': (changed, total, finder.odds_cache.near_kickoff(sport, KICKOFF_WINDOW)),
+            'remaining': finder.requests_remaining,
+            'metrics': metrics.drain(),
+        })
+    
+    if recorder:
+        recorder.stop()
+
+
+class ShardCoordinator:
+    """
+    Spreads every in-season sport over a pool of worker processes.
+    The coordinator owns sport discovery, the dedupe store, the live stream and (through
+    monitor_arbitrage) the poll schedule and alert dispatcher; workers only
+    exchange plain picklable messages over queues, so they could later sit
+    behind a network queue on other hosts.
+    Sports go to whichever worker is free, preferring the one that scanned
+    them last (its OddsCache is warm). A sport that overruns SPORT_TIMEOUT
+    has its worker replaced; the other workers carry on.
+    """
+    
+    def __init__(self, finder: ArbitrageFinder, workers: int = SCAN_WORKERS,
+                 timeout: float = SPORT_TIMEOUT):
+        self.finder = finder
+        self.timeout = timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.workers = [None] * workers
+        self.sequence = itertools.count()
+        self.affinity = {}   # sport -> worker that scanned it last
+        self.activity = {}   # sport -> (changed, total, near_kickoff) from its latest poll
+        self.requests_remaining = None
+        self.discovered = []
+        self.discovered_at = 0.0
+    
+    def start(self):
+        for worker_id in range(len(self.workers)):
+            self._spawn(worker_id)
+        return self
+    
+    def stop(self, timeout: float = 10):
+        for worker in self.workers:
+            worker['tasks'].put(None)
+        for worker in self.workers:
+            worker['process'].join(timeout)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+    
+    def _spawn(self, worker_id: int):
+        tasks = self.context.Queue()
+        snapshot_dir = os.path.join(SNAPSHOT_DIR, f"worker-{worker_id}") if SNAPSHOT_DIR else None
+        process = self.context.Process(
+            target=shard_worker, daemon=True,
+            args=(worker_id, self.finder.api_key, self.finder.base_url, tasks, self.results, snapshot_dir)
+        )
+        process.start()
+        self.workers[worker_id] = {'process': process, 'tasks': tasks, 'sport': None,
+                                   'sequence': None, 'started': 0.0}
+    
+    def sports(self) -> List[str]:
+        """In-season sports from /sports, refreshed every SPORTS_REFRESH_INTERVAL"""
+        now = time.time()
+        if now - self.discovered_at >= SPORTS_REFRESH_INTERVAL:
+            discovered = self.finder.get_sports()
+            if discovered:
+                if set(discovered) != set(self.discovered):
+                    print(f"🗂️  {len(discovered)} in-season sports")
+                self.discovered = discovered
+                self.discovered_at = now
+            else:
+                self.discovered_at = now - SPORTS_REFRESH_INTERVAL + 60  # retry in a minute
+        return self.discovered or get_todays_sports()
+    
+    def scan(self, sports: List[str], total_stake: float = 1000,
+             idle: Optional[float] = None) -> Iterator[Tuple[Optional[str], List[Dict]]]:
+        """
+        Scan sports on free workers, yielding each sport as soon as it finishes (or times out).
+        With `idle`, (None, []) is yielded whenever that many seconds pass without a sport finishing.
+        """
+        pending = list(sports)
+        waiting = set(sports)
+        last_yield = time.monotonic()
+        
+        while waiting:
+            self._assign(pending, total_stake)
+            
+            try:
+                message = self.results.get(timeout=0.5 if idle is None else min(idle, 0.5))
+            except Empty:
+                message = None
+            if message is not None and self._finish(message):
+                waiting.discard(message['sport'])
+                live_stream.track(message['opportunities'], message['scanned'])
+                last_yield = time.monotonic()
+                yield message['sport'], message['opportunities']
+            
+            for sport in self._reap():
+                waiting.discard(sport)
+                last_yield = time.monotonic()
+                yield sport, []
+            
+            if idle is not None and waiting and time.monotonic() - last_yield >= idle:
+                last_yield = time.monotonic()
+                yield None, []
+    
+    def _assign(self, pending: List[str], total_stake: float):
+        idle = [i for i, worker in enumerate(self.workers) if worker['sport'] is None]
+        in_flight = {worker['sport'] for worker in self.workers}
+        
+        for sport in list(pending):
+            if not idle:
+                break
+            if sport in in_flight:
+                continue  # Still running from an earlier scan; its result will arrive
+            worker_id = self.affinity.get(sport)
+            if worker_id not in idle:
+                worker_id = idle[0]
+            idle.remove(worker_id)
+            pending.remove(sport)
+            
+            worker = self.workers[worker_id]
+            worker.update(sport=sport, sequence=next(self.sequence), started=time.monotonic())
+            worker['tasks'].put((worker['sequence'], sport, total_stake))
+            self.affinity[sport] = worker_id
+        
+        metrics.set('arb_shard_busy_workers', sum(w['sport'] is not None for w in self.workers))
+    
+    def _finish(self, message: Dict) -> bool:
+        """Book a worker's result; False if it came from a worker that has since been replaced"""
+        worker = self.workers[message['worker']]
+        if worker['sequence'] != message['sequence']:
+            return False
+        
+        metrics.observe('arb_shard_task_seconds', time.monotonic() - worker['started'], sport=message['sport'])
+        worker['sport'] = worker['sequence'] = None
+        
+        kinds, values, histograms = message['metrics']
+        metrics.merge(kinds, values, histograms)
+        with stats_lock:
+            stats['api_calls'] += values.get(('arb_api_calls_total', ()), 0)
+        
+        self.activity[message['sport']] = message['activity']
+        if message['remaining'] is not None:
+            self.requests_remaining = message['remaining']
+        return True
+    
+    def _reap(self) -> List[str]:
+        """Replace workers that are stuck on (or died during) a sport"""
+        now = time.monotonic()
+        stuck = []
+        for worker_id, worker in enumerate(self.workers):
+            sport = worker['sport']
+            if sport is None:
+                continue
+            if now - worker['started'] < self.timeout and worker['process'].is_alive():
+                continue
+            
+            print(f"⏱️  {sport}: worker {worker_id} stuck for {now - worker['started']:.0f}s, replacing it")
+            metrics.inc('arb_sport_timeouts_total', sport=sport)
+            worker['process'].terminate()
+            worker['process'].join(5)
+            self.affinity.pop(sport, None)
+            self._spawn(worker_id)
+            stuck.append(sport)
+        return stuck
+
+
+def report_opportunities(opportunities: List[Dict], dispatcher: Optional[AlertDispatcher]):
+    """Queue alerts for (or print) a batch of opportunities"""
+    print(f"🎉 FOUND {len(opportunities)} OPPORTUNITY(IES)!")
+    
+    # Telegram alerts go out from the dispatcher thread, best profit first
+    if dispatcher:
+        for opp in opportunities:
+            dispatcher.submit(opp)
+    else:
+        # Just print to console
+        for opp in opportunities:
+            print(f"\n💰 {opp['home_team']} vs {opp['away_team']}")
+            print(f"   Profit: KES {opp['profit_amount']} ({opp['profit_percent']}%)")
+            for bet in opp['bets']:
+                print(f"   - {bet['bet_type']}: KES {bet['stake']} @ {bet['bookmaker']}")
+
+
+def fund_opportunities(finder: ArbitrageFinder, allocator: StakeAllocator,
+                       opportunities: List[Dict]) -> List[Dict]:
+    """
+    Stake a batch out of the allocator's budget and record the funded arbs as
+    alerted. Arbs the last batch couldn't fund join in again while they are
+    still open with fresh prices, since an unchanged event isn't rescanned.
+    """
+    now = time.time()
+    candidates = {}
+    for key in allocator.unfunded:
+        opp = live_stream.get(key)
+        if opp is None:
+            continue  # Closed since
+        oldest = opp.get('timestamps', {}).get('oldest_quote')
+        if MAX_QUOTE_AGE and oldest is not None and now - oldest > MAX_QUOTE_AGE:
+            continue  # Its prices went stale without the event being rescanned
+        candidates[key] = opp
+    candidates.update((opp['key'], opp) for opp in opportunities)
+    
+    # Dedupe records an arb only once it is funded, so a skipped one can still be alerted later
+    candidates = [opp for opp in candidates.values()
+                  if not finder.dedupe.alerted(opp['key'], opp['profit_percent'])]
+    return finder.accept(allocator.allocate(candidates))
+
+
+def monitor_arbitrage(finder: ArbitrageFinder, notifier: Optional[TelegramNotifier],
+                      coordinator: Optional[ShardCoordinator] = None):
     """Main monitoring loop"""
     
     print("\n" + "="*80)
     print("🚀 SEMI-AUTOMATED ARBITRAGE MONITOR - REAL-TIME")
     print("="*80)
-    print(f"\n⚡ Checking every {CHECK_INTERVAL} seconds")
-    print(f"💰 Stake: KES {MAX_STAKE_KES}")
+    print(f"\n⚡ Adaptive polling every {MIN_POLL_INTERVAL}-{MAX_POLL_INTERVAL} seconds")
+    if coordinator:
+        print(f"🧩 Sharded: {len(coordinator.workers)} worker processes, every in-season sport")
+    else:
+        print(f"🧵 Parallel fetches: {FETCH_CONCURRENCY}")
+    if finder.providers:
+        print(f"🔗 Extra odds feeds: {', '.join(provider.name for provider in finder.providers)}")
+    print(f"💰 Stake: up to KES {MAX_STAKE_KES} per arb, KES {BANKROLL_KES} per cycle")
     print(f"📊 Min Profit: {MIN_PROFIT_PERCENT}%")
     
     if ACTIVE_START_HOUR != 0 or ACTIVE_END_HOUR != 0:
@@ -436,6 +3441,12 @@ def monitor_arbitrage(finder: ArbitrageFinder, notifier: Optional[TelegramNotifi
     print("⚠️  Keep this window open!")
     print("📱 Press Ctrl+C to stop\n")
     
+    dispatcher = AlertDispatcher(notifier).start() if notifier else None
+    credits_per_poll = len(ODDS_REGIONS.split(',')) * len(ODDS_MARKETS.split(','))
+    # Hot polling needs the scan's odds cache, so it is off when sports are sharded
+    hot = HotPoller(finder, credits_per_poll) if finder.hot_set is not None and not coordinator else None
+    scheduler = PollScheduler(credits_per_poll, quota_share=1 - HOT_QUOTA_SHARE if hot else 1.0)
+    allocator = StakeAllocator()
     last_summary_day = datetime.now().day
     
     while True:
@@ -447,43 +3458,81 @@ def monitor_arbitrage(finder: ArbitrageFinder, notifier: Optional[TelegramNotifi
                 time.sleep(300)  # Check every 5 min
                 continue
             
-            # Get today's sports
-            sports_to_search = get_todays_sports()
+            # Get today's sports that are due for a poll
+            todays_sports = coordinator.sports() if coordinator else get_todays_sports()
+            sports_to_search = scheduler.due(todays_sports)
             
-            stats['searches'] += 1
-            now = datetime.now().strftime('%H:%M:%S')
+            # Near-arb events first: one request each, between full polls
+            if hot and hot.due():
+                found = [opp for _, opportunities in hot.poll(MAX_STAKE_KES) for opp in opportunities]
+                opportunities = fund_opportunities(finder, allocator, found)
+                if opportunities:
+                    report_opportunities(opportunities, dispatcher)
             
-            print(f"\n🔍 [{now}] Searching {len(sports_to_search)} sports... (Check #{stats['searches']})")
+            wait = scheduler.seconds_until_next(todays_sports)
+            if hot:
+                wait = min(wait, hot.seconds_until_next())
             
-            # Search all sports
-            all_opportunities = []
-            for sport in sports_to_search:
-                opportunities = finder.find_arbitrage_opportunities(sport, MAX_STAKE_KES)
-                if opportunities:
-                    all_opportunities.extend(opportunities)
+            if not sports_to_search:
+                time.sleep(wait)
+                continue
             
-            # Report results
-            if all_opportunities:
-                print(f"🎉 FOUND {len(all_opportunities)} OPPORTUNITY(IES)!")
+            bump_stat('searches')
+            allocator.start_cycle()
+            profiler.cycle_started()
+            cycle_start = time.perf_counter()
+            now = datetime.now().strftime('%H:%M:%S')
+            
+            # A failed cycle must still stop the sampler / tracemalloc
+            try:
+                print(f"\n🔍 [{now}] Searching {len(sports_to_search)} sports... (Check #{stats['searches']})")
                 
-                # Send Telegram alerts
-                if notifier:
-                    for opp in all_opportunities:
-                        message = notifier.format_opportunity(opp)
-                        if notifier.send_message(message):
-                            print(f"📱 Alert sent: {opp['home_team']} vs {opp['away_team']} (KES {opp['profit_amount']})")
-                        else:
-                            print(f"❌ Failed to send alert")
-                        time.sleep(1)  # Avoid Telegram rate limit
-                else:
-                    # Just print to console
-                    for opp in all_opportunities:
-                        print(f"\n💰 {opp['home_team']} vs {opp['away_team']}")
-                        print(f"   Profit: KES {opp['profit_amount']} ({opp['profit_percent']}%)")
-                        for bet in opp['bets']:
-                            print(f"   - {bet['bet_type']}: KES {bet['stake']} @ {bet['bookmaker']}")
-            else:
+                # Search due sports in parallel. The arbs of every sport that reports within
+                # ALLOCATION_WINDOW of the first are staked together out of the cycle's bankroll;
+                # a slow or stuck sport is funded from what's left when it arrives
+                found, all_opportunities = [], []
+                window_ends = None
+                funded_any = False
+                scan = coordinator.scan if coordinator else finder.find_arbitrage_concurrently
+                for sport, opportunities in scan(sports_to_search, MAX_STAKE_KES, idle=0.25):
+                    if sport is not None:
+                        found.extend(opportunities)
+                        if window_ends is None:
+                            window_ends = time.monotonic() + ALLOCATION_WINDOW
+                    if found and window_ends is not None and time.monotonic() >= window_ends:
+                        funded = fund_opportunities(finder, allocator, found)
+                        found, funded_any = [], True
+                        if funded:
+                            report_opportunities(funded, dispatcher)
+                            all_opportunities.extend(funded)
+                    if sport is None:
+                        continue
+                    
+                    if coordinator:
+                        scheduler.update_quota(coordinator.requests_remaining)
+                        changed, total, near_kickoff = coordinator.activity.get(sport, (0, 0, 0))
+                    else:
+                        scheduler.update_quota(finder.requests_remaining)
+                        changed, total = finder.odds_cache.activity.get(sport, (0, 0))
+                        near_kickoff = finder.odds_cache.near_kickoff(sport, KICKOFF_WINDOW)
+                    scheduler.record_poll(sport, todays_sports, changed, total, near_kickoff)
+                
+                # Whatever is still waiting (and last round's unfunded arbs, if nothing ran yet)
+                if found or not funded_any:
+                    funded = fund_opportunities(finder, allocator, found)
+                    if funded:
+                        report_opportunities(funded, dispatcher)
+                        all_opportunities.extend(funded)
+                
+                metrics.observe('arb_cycle_seconds', time.perf_counter() - cycle_start)
+            finally:
+                profiler.cycle_finished()
+            
+            if not all_opportunities:
                 print(f"   No opportunities | API: {stats['api_calls']} calls | Found today: {stats['opportunities_found']}")
+            remaining = coordinator.requests_remaining if coordinator else finder.requests_remaining
+            if remaining is not None:
+                print(f"   Quota left: {remaining} | Next poll in {scheduler.seconds_until_next(todays_sports):.0f}s")
             
             # Send daily summary
             current_day = datetime.now().day
@@ -491,15 +3540,21 @@ def monitor_arbitrage(finder: ArbitrageFinder, notifier: Optional[TelegramNotifi
                 notifier.send_daily_summary()
                 last_summary_day = current_day
                 # Reset daily stats
-                stats['searches'] = 0
-                stats['opportunities_found'] = 0
-                stats['started_at'] = datetime.now()
+                with stats_lock:
+                    stats['searches'] = 0
+                    stats['opportunities_found'] = 0
+                    stats['started_at'] = datetime.now()
             
-            # Wait before next check
-            time.sleep(CHECK_INTERVAL)
+            # Wait until the next sport (or hot round) is due
+            wait = scheduler.seconds_until_next(todays_sports)
+            if hot:
+                wait = min(wait, hot.seconds_until_next())
+            time.sleep(wait)
             
         except KeyboardInterrupt:
             print("\n\n⚠️  Stopping monitor...")
+            if dispatcher:
+                dispatcher.stop()
             if notifier:
                 notifier.send_message("🛑 Arbitrage monitor stopped.")
             print("\n📊 Final Stats:")
@@ -522,7 +3577,14 @@ def main():
     print("✅ Flask server running on port 8080")
     print("🔗 Bot will stay alive as long as UptimeRobot pings it!\n")
     
-    finder = ArbitrageFinder(ODDS_API_KEY)
+    # Sharded workers record their own payloads (see shard_worker)
+    recorder = SnapshotRecorder(SNAPSHOT_DIR).start() if SNAPSHOT_DIR and not SCAN_WORKERS else None
+    finder = ArbitrageFinder(ODDS_API_KEY, dedupe=DedupeStore(DEDUPE_DB_PATH), recorder=recorder)
+    coordinator = ShardCoordinator(finder).start() if SCAN_WORKERS else None
+    
+    # `kill -USR1 <pid>` profiles the next PROFILE_CYCLES cycles (this process only, not shard workers)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.request(PROFILE_CYCLES))
     
     if TELEGRAM_BOT_TOKEN == "YOUR_BOT_TOKEN_HERE":
         notifier = None
@@ -531,14 +3593,19 @@ def main():
         # Send startup message
         notifier.send_message(
             f"🚀 <b>Arbitrage Monitor Started!</b>\n\n"
-            f"⚡ Checking every {CHECK_INTERVAL} seconds\n"
-            f"💰 Stake: KES {MAX_STAKE_KES}\n"
+            f"⚡ Adaptive polling every {MIN_POLL_INTERVAL}-{MAX_POLL_INTERVAL} seconds\n"
+            f"💰 Stake: up to KES {MAX_STAKE_KES} per arb, KES {BANKROLL_KES} per cycle\n"
             f"📊 Min Profit: {MIN_PROFIT_PERCENT}%\n\n"
             f"You'll get instant alerts! 📱"
         )
     
     # Start monitoring
-    monitor_arbitrage(finder, notifier)
+    monitor_arbitrage(finder, notifier, coordinator)
+    
+    if coordinator:
+        coordinator.stop()
+    if recorder:
+        recorder.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the arbitrage pipeline
+- Seeded synthetic Odds API v4 payloads (events, bookmakers, markets, arb density)
+- Local HTTP stand-in for /v4/sports/{sport}/odds and Telegram sendMessage
+- Injectable latency for both
+- Throughput + p50/p99 for the fetch, filter, model, scan, format and alert stages
+- The streaming filter is also timed against json.loads of the whole body plus the same filter
+- No API quota spent, nothing sent to Telegram
+
+Usage: python bench.py --events 200 --bookmakers 40 --api-latency 0.2
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import arb
+
+# ============================================================================
+# SYNTHETIC ODDS API PAYLOADS
+# ============================================================================
+
+FILLER_BOOKMAKERS = [
+    ('pinnacle', 'Pinnacle'), ('williamhill', 'William Hill'), ('unibet_eu', 'Unibet'),
+    ('betfair_ex_eu', 'Betfair'), ('marathonbet', 'Marathon Bet'), ('betsson', 'Betsson'),
+    ('nordicbet', 'Nordic Bet'), ('coolbet', 'Coolbet'), ('everygame', 'Everygame'),
+    ('matchbook', 'Matchbook'), ('sport888', '888sport'), ('paddypower', 'Paddy Power'),
+]
+
+
+def bookmaker_pool(count: int) -> List[tuple]:
+    """`count` bookmakers, Kenyan ones first so every event has something to keep"""
+    kenyan = [(key, key.title()) for key in arb.KENYAN_BOOKMAKERS]
+    pool = kenyan + FILLER_BOOKMAKERS
+    pool += [(f'book{i}', f'Book {i}') for i in range(max(0, count - len(pool)))]
+    return pool[:count]
+
+
+def _priced_outcomes(rng: random.Random, fair: List[float], margin: float) -> List[float]:
+    """Decimal odds for fair probabilities with a bookmaker margin and a little noise"""
+    return [round(1 / (p * (1 + margin)) * rng.uniform(0.985, 1.015), 2) for p in fair]
+
+
+def generate_odds_payload(sport: str, n_events: int = 50, n_bookmakers: int = 20,
+                          markets: List[str] = None, arb_density: float = 0.05,
+                          seed: int = 42) -> List[Dict]:
+    """
+    Odds API v4 shaped list of events.
+    Every bookmaker prices the same fair line with a 4-8% margin and ~1.5%
+    noise; a share of events (`arb_density`) gets one line boosted into a
+    ~1-6% arb, each outcome at a different Kenyan bookmaker.
+    """
+    markets = markets or ['h2h']
+    rng = random.Random(f"{seed}-{sport}")
+    is_3_way = 'soccer' in sport or 'football' in sport
+    bookmakers = bookmaker_pool(n_bookmakers)
+    kenyan = [i for i, (key, _) in enumerate(bookmakers) if key in arb.KENYAN_BOOKMAKERS]
+    now = datetime.now(timezone.utc)
+    stamp = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+    
+    events = []
+    for i in range(n_events):
+        home, away = f"{sport[:3].title()} Home {i}", f"{sport[:3].title()} Away {i}"
+        lines = []
+        for market in markets:
+            if market == 'h2h':
+                lines.append((market, [home, away] + (['Draw'] if is_3_way else []), [None] * (3 if is_3_way else 2)))
+            elif market == 'totals':
+                point = rng.choice([1.5, 2.5, 3.5]) if is_3_way else rng.choice([210.5, 220.5, 230.5])
+                lines.append((market, ['Over', 'Under'], [point, point]))
+            elif market == 'spreads':
+                point = rng.choice([-1.5, -0.5, 0.5, 1.5])
+                lines.append((market, [home, away], [point, -point]))
+        
+        fair = {}
+        for market, names, _ in lines:
+            weights = [rng.uniform(0.5, 1.5) for _ in names]
+            fair[market] = [w / sum(weights) for w in weights]
+        
+        prices = {
+            (b, market): _priced_outcomes(rng, fair[market], rng.uniform(0.04, 0.08))
+            for b in range(len(bookmakers)) for market, names, _ in lines
+        }
+        
+        # Boost one line into an arb: each outcome's best price comes from a different book
+        if kenyan and rng.random() < arb_density:
+            market, names, _ = rng.choice(lines)
+            target = 1 / (1 + rng.uniform(0.01, 0.06))
+            shares = [rng.uniform(0.5, 1.5) for _ in names]
+            for o, share in enumerate(shares):
+                b = kenyan[o % len(kenyan)]
+                prices[(b, market)][o] = round(1 / (share / sum(shares) * target), 2)
+        
+        event = {
+            'id': f"{sport}-{seed}-{i}",
+            'sport_key': sport,
+            'sport_title': sport,
+            'commence_time': (now + timedelta(hours=1 + i % 48)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'home_team': home,
+            'away_team': away,
+            'bookmakers': [
+                {
+                    'key': key,
+                    'title': title,
+                    'last_update': stamp,
+                    'markets': [
+                        {
+                            'key': market,
+                            'last_update': stamp,
+                            'outcomes': [
+                                dict({'name': name, 'price': price}, **({'point': point} if point is not None else {}))
+                                for name, price, point in zip(names, prices[(b, market)], points)
+                            ]
+                        }
+                        for market, names, points in lines
+                    ]
+                }
+                for b, (key, title) in enumerate(bookmakers)
+            ]
+        }
+        events.append(event)
+    
+    return events
+
+# ============================================================================
+# LOCAL STAND-IN SERVER (Odds API + Telegram)
+# ============================================================================
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Set by StandInServer
+    payloads: Dict[str, bytes] = {}
+    api_latency = 0.0
+    telegram_latency = 0.0
+    jitter = 0.0
+    sent_messages = 0
+    
+    def log_message(self, *args):
+        pass
+    
+    def _delay(self, base: float):
+        if base or self.jitter:
+            time.sleep(max(0.0, base + random.uniform(-self.jitter, self.jitter) * base))
+    
+    def _reply(self, status: int, body: bytes, headers: Optional[Dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        # /v4/sports/{sport}/odds?...
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 4 and parts[:2] == ['v4', 'sports'] and parts[3] == 'odds':
+            body = self.payloads.get(parts[2], b'[]')
+            self._delay(self.api_latency)
+            self._reply(200, body, {'x-requests-remaining': '100000', 'x-requests-used': '0'})
+        else:
+            self._reply(404, b'{"message": "Unknown endpoint"}')
+    
+    def do_POST(self):
+        # /bot{token}/sendMessage
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.endswith('/sendMessage'):
+            self._delay(self.telegram_latency)
+            StandInHandler.sent_messages += 1
+            self._reply(200, b'{"ok": true, "result": {}}')
+        else:
+            self._reply(404, b'{"ok": false}')
+
+
+class StandInServer:
+    """Threaded local server that plays the Odds API and Telegram"""
+    
+    def __init__(self, payloads: Dict[str, List[Dict]], api_latency: float = 0.0,
+                 telegram_latency: float = 0.0, jitter: float = 0.0):
+        handler = type('Handler', (StandInHandler,), {
+            'payloads': {sport: json.dumps(events).encode() for sport, events in payloads.items()},
+            'api_latency': api_latency,
+            'telegram_latency': telegram_latency,
+            'jitter': jitter,
+        })
+        self.handler = handler
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StageTimer:
+    """Collects per-call latencies and item counts for each stage"""
+    
+    def __init__(self):
+        self.samples = {}  # stage -> list of seconds
+        self.items = {}    # stage -> items processed
+    
+    def record(self, stage: str, seconds: float, items: int = 1):
+        self.samples.setdefault(stage, []).append(seconds)
+        self.items[stage] = self.items.get(stage, 0) + items
+    
+    def summary(self) -> List[Dict]:
+        rows = []
+        for stage, samples in self.samples.items():
+            total = sum(samples)
+            rows.append({
+                'stage': stage,
+                'calls': len(samples),
+                'items': self.items[stage],
+                'items_per_sec': self.items[stage] / total if total else 0.0,
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+            })
+        return rows
+
+
+def json_loads_filtered(body: bytes, bookmaker_filter: arb.BookmakerFilter) -> List[Dict]:
+    """Baseline for OddsStreamParser: decode the whole payload at once, then filter it"""
+    events = []
+    for event in json.loads(body):
+        bookmakers = [bm for bm in event.get('bookmakers', [])
+                      if bookmaker_filter.matches(bm.get('key', ''), bm.get('title', ''))]
+        if bookmakers:
+            event['bookmakers'] = bookmakers
+            events.append(event)
+    return events
+
+
+def run_benchmark(args) -> List[Dict]:
+    sports = [f"soccer_bench_{i}" if i % 2 == 0 else f"basketball_bench_{i}" for i in range(args.sports)]
+    markets = args.markets.split(',')
+    payloads = {
+        sport: generate_odds_payload(sport, args.events, args.bookmakers, markets, args.arb_density, args.seed)
+        for sport in sports
+    }
+    timer = StageTimer()
+    
+    with StandInServer(payloads, args.api_latency, args.telegram_latency, args.jitter) as server:
+        finder = arb.ArbitrageFinder('bench', max_workers=args.concurrency)
+        finder.base_url = f"{server.url}/v4"
+        notifier = arb.TelegramNotifier('bench', 'bench')
+        notifier.base_url = f"{server.url}/botbench"
+        params = {'apiKey': 'bench', 'regions': arb.ODDS_REGIONS, 'markets': args.markets, 'oddsFormat': 'decimal'}
+        
+        for _ in range(args.iterations):
+            for sport in sports:
+                is_3_way = finder.is_3_way_sport(sport)
+                
+                # Fetch: raw bytes over the pooled session
+                start = time.perf_counter()
+                body = finder.session.get(f"{finder.base_url}/sports/{sport}/odds", params=params, timeout=15).content
+                timer.record('fetch', time.perf_counter() - start)
+                
+                # Filter: streaming JSON decode + bookmaker filter
+                chunks = [body[i:i + arb.STREAM_CHUNK_SIZE] for i in range(0, len(body), arb.STREAM_CHUNK_SIZE)]
+                start = time.perf_counter()
+                events = list(arb.OddsStreamParser(finder.bookmaker_filter).iter_events(chunks))
+                timer.record('filter', time.perf_counter() - start, len(events))
+                
+                start = time.perf_counter()
+                baseline = json_loads_filtered(body, finder.bookmaker_filter)
+                timer.record('filter (json.loads)', time.perf_counter() - start, len(baseline))
+                
+                # Model: event dicts -> compact quote tables (done once per changed event live)
+                start = time.perf_counter()
+                quotes = [q for q in map(arb.EventQuotes.from_api, events) if q is not None]
+                timer.record('model', time.perf_counter() - start, len(events))
+                
+                # Scan: every event, no cache or dedupe in the way
+                start = time.perf_counter()
+                arbs = finder.find_arbs(quotes, is_3_way, arb.MAX_STAKE_KES)
+                timer.record('scan', time.perf_counter() - start, len(quotes))
+                
+                opportunities = [
+                    finder.build_opportunity(sport, found, arb.MAX_STAKE_KES, is_3_way)
+                    for found in arbs
+                ]
+                
+                for opp in opportunities:
+                    start = time.perf_counter()
+                    message = notifier.format_opportunity(opp)
+                    timer.record('format', time.perf_counter() - start)
+                    
+                    if args.alerts:
+                        start = time.perf_counter()
+                        notifier.deliver(message)
+                        timer.record('alert', time.perf_counter() - start)
+            
+            # End to end: concurrent fetch + scan of every sport, cold cache
+            finder.odds_cache = arb.OddsCache()
+            finder.dedupe = arb.DedupeStore()
+            start = time.perf_counter()
+            for _ in finder.find_arbitrage_concurrently(sports, arb.MAX_STAKE_KES):
+                pass
+            timer.record('cycle', time.perf_counter() - start, len(sports))
+    
+    return timer.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline arbitrage pipeline benchmark")
+    parser.add_argument('--sports', type=int, default=5, help="sports per cycle")
+    parser.add_argument('--events', type=int, default=50, help="events per sport")
+    parser.add_argument('--bookmakers', type=int, default=30, help="bookmakers per event")
+    parser.add_argument('--markets', default='h2h,totals,spreads')
+    parser.add_argument('--arb-density', type=float, default=0.05, help="share of events with an arb")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--api-latency', type=float, default=0.0, help="seconds per odds request")
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help="seconds per sendMessage")
+    parser.add_argument('--jitter', type=float, default=0.0, help="+/- fraction of latency")
+    parser.add_argument('--concurrency', type=int, default=arb.FETCH_CONCURRENCY)
+    parser.add_argument('--no-alerts', dest='alerts', action='store_false', help="skip the Telegram stage")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="also write results to this file")
+    args = parser.parse_args()
+    
+    print(f"📊 {args.sports} sports x {args.events} events x {args.bookmakers} bookmakers, "
+          f"markets={args.markets}, arb density={args.arb_density}")
+    results = run_benchmark(args)
+    
+    print(f"\n{'stage':<19} {'calls':>7} {'items':>8} {'items/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for row in results:
+        print(f"{row['stage']:<19} {row['calls']:>7} {row['items']:>8} {row['items_per_sec']:>12.1f} "
+              f"{row['p50_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
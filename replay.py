@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Replay recorded odds through the arbitrage scanner in simulated time
+- Reads the snapshot recorder's daily files (snapshots/odds-*.bin) or captured Odds API JSON
+- Same OddsCache / find_arbs / calculate_stakes path as the live bot, but no sleeping and no quota
+- Reports how many arbs each poll interval, MIN_PROFIT_PERCENT and bookmaker set would have caught
+  (.bin snapshots only hold the bookmakers the live filter kept; wider sets need captured JSON)
+- Reports how long the arbs lasted
+- One worker process per sport and bookmaker set
+
+Usage: python replay.py snapshots/ --interval 60 300 900 --min-profit 0.5 1 2 --bookmakers kenyan betika,sportpesa
+"""
+
+import argparse
+import glob
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import arb
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def snapshot_files(paths: List[str]) -> List[str]:
+    """Expand directories (recursively, e.g. per-worker subdirectories) into their .bin / .json files"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += (glob.glob(os.path.join(path, '**', '*.bin'), recursive=True)
+                      + glob.glob(os.path.join(path, '**', '*.json'), recursive=True))
+        else:
+            files.append(path)
+    # Daily file names sort chronologically (iter_snapshots still merges them by fetch time)
+    return sorted(files, key=os.path.basename)
+
+
+def load_capture(path: str) -> List[Tuple[float, str, List[Dict]]]:
+    """
+    Captured Odds API JSON as (fetched_at, sport, events), sorted by time.
+    Accepts a raw /odds response, or one or a list of {'fetched_at', 'sport', 'data'}.
+    Without fetched_at, the newest bookmaker last_update (or the file mtime) is used.
+    """
+    with open(path, encoding='utf-8') as f:
+        payload = json.load(f)
+    
+    if isinstance(payload, dict):
+        captures = [payload]
+    elif payload and isinstance(payload[0], dict) and 'data' in payload[0]:
+        captures = payload
+    else:
+        captures = [{'data': payload}]
+    
+    snapshots = []
+    for capture in captures:
+        events = capture.get('data') or []
+        fetched_at = capture.get('fetched_at')
+        if isinstance(fetched_at, str):
+            fetched_at = arb.parse_api_time(fetched_at)
+        if fetched_at is None:
+            stamps = [arb.parse_api_time(bm.get('last_update'))
+                      for event in events for bm in event.get('bookmakers', [])]
+            stamps = [stamp for stamp in stamps if stamp]
+            fetched_at = max(stamps) if stamps else os.path.getmtime(path)
+        
+        by_sport = {}
+        for event in events:
+            by_sport.setdefault(capture.get('sport') or event.get('sport_key', 'unknown'), []).append(event)
+        snapshots += [(fetched_at, sport, sport_events) for sport, sport_events in by_sport.items()]
+    
+    snapshots.sort(key=lambda snapshot: snapshot[0])
+    return snapshots
+
+
+def dataset_sports(files: List[str]) -> List[str]:
+    sports = set()
+    for path in files:
+        if path.endswith('.bin'):
+            reader = arb.SnapshotReader(path)
+            if arb.np is not None:
+                sport_ids = arb.np.unique(reader.array()['sport']).tolist()
+            else:
+                sport_ids = {record[1] for record in reader.records()}
+            sports.update(reader.strings[i] for i in sport_ids)
+            reader.close()
+        else:
+            sports.update(sport for _, sport, _ in load_capture(path))
+    return sorted(sports)
+
+
+def file_snapshots(path: str, sport: str) -> Iterator[Tuple[float, List[Dict]]]:
+    """(fetched_at, events) for one sport from one file, in time order"""
+    if path.endswith('.bin'):
+        reader = arb.SnapshotReader(path)
+        for fetched_at, _, events in reader.payloads([sport]):
+            yield fetched_at, events
+        reader.close()
+    else:
+        for fetched_at, capture_sport, events in load_capture(path):
+            if capture_sport == sport:
+                yield fetched_at, events
+
+
+def recorded_bookmakers(files: List[str]) -> set:
+    """(key, title) of every bookmaker in the .bin snapshots"""
+    bookmakers = set()
+    for path in files:
+        if not path.endswith('.bin'):
+            continue
+        reader = arb.SnapshotReader(path)
+        if arb.np is not None:
+            table = reader.array()
+            pairs = arb.np.unique(arb.np.stack([table['bookmaker'], table['bookmaker_title']], axis=1), axis=0).tolist()
+            del table
+        else:
+            pairs = {(record[6], record[7]) for record in reader.records()}
+        bookmakers.update((reader.strings[key], reader.strings[title]) for key, title in pairs)
+        reader.close()
+    return bookmakers
+
+
+def iter_snapshots(files: List[str], sport: str) -> Iterator[Tuple[float, List[Dict]]]:
+    """
+    (fetched_at, events) for one sport across all files, in time order.
+    A sport can move between shard workers, so one day's payloads may be
+    split over several worker-N/odds-DAY.bin files: those are merged by fetch
+    time, and the days follow one another so only one day is held at a time.
+    """
+    for _, day_files in itertools.groupby(sorted(files, key=os.path.basename), key=os.path.basename):
+        yield from heapq.merge(*(file_snapshots(path, sport) for path in day_files),
+                               key=lambda snapshot: snapshot[0])
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+def bookmaker_filter(spec: str) -> Optional[arb.BookmakerFilter]:
+    """'all' keeps every bookmaker, 'kenyan' uses KENYAN_BOOKMAKERS, otherwise a comma-separated list"""
+    if spec == 'all':
+        return None
+    if spec == 'kenyan':
+        return arb.BookmakerFilter(arb.KENYAN_BOOKMAKERS)
+    return arb.BookmakerFilter(spec.split(','))
+
+
+def restrict(events: List[Dict], keep: arb.BookmakerFilter) -> List[Dict]:
+    restricted = []
+    for event in events:
+        bookmakers = [bm for bm in event.get('bookmakers', []) if keep.matches(bm['key'], bm.get('title', ''))]
+        if bookmakers:
+            restricted.append(dict(event, bookmakers=bookmakers))
+    return restricted
+
+
+def find_episodes(snapshots: Iterator[Tuple[float, List[Dict]]], sport: str, min_profits: List[float],
+                  keep: Optional[arb.BookmakerFilter], total_stake: float) -> Dict:
+    """
+    Walk every snapshot in simulated time and record each arb's lifetime per min_profit.
+    An episode runs from the first snapshot showing the arb to the first one without it.
+    """
+    finder = arb.ArbitrageFinder('', max_workers=1)
+    is_3_way = finder.is_3_way_sport(sport)
+    cache = arb.OddsCache()
+    floor = min(min_profits)
+    
+    # event_id -> [(opportunity key, profit %, event name, market name)] in the event's latest version
+    current = {}
+    open_episodes = {m: {} for m in min_profits}
+    episodes = {m: [] for m in min_profits}
+    first = last = None
+    count = 0
+    
+    for fetched_at, events in snapshots:
+        if keep is not None:
+            events = restrict(events, keep)
+        first = fetched_at if first is None else first
+        last = fetched_at
+        count += 1
+        
+        # Only moved events are rescanned, exactly like scan_odds
+        changed = cache.update(sport, events, now=fetched_at)
+        for event_id in [eid for eid in current if eid not in cache.events]:
+            del current[event_id]
+        for event in changed:
+            current[event.id] = []
+        
+        for found in finder.find_arbs(changed, is_3_way, total_stake, floor, now=fetched_at):
+            event = found.event
+            current[event.id].append((
+                found.key,
+                found.profit_percent,
+                f"{event.home_team} vs {event.away_team}",
+                arb.market_display_name(found.market, found.point),
+            ))
+        
+        live = [entry for entries in current.values() for entry in entries]
+        for min_profit in min_profits:
+            running = open_episodes[min_profit]
+            active = {key: (profit, event_name, market_name)
+                      for key, profit, event_name, market_name in live if profit >= min_profit}
+            
+            for key in [key for key in running if key not in active]:
+                episode = running.pop(key)
+                episode['end'] = fetched_at
+                episodes[min_profit].append(episode)
+            
+            for key, (profit, event_name, market_name) in active.items():
+                episode = running.get(key)
+                if episode is None:
+                    running[key] = {
+                        'key': key, 'event': event_name, 'market': market_name,
+                        'start': fetched_at, 'end': None, 'censored': False,
+                        'profits': [(fetched_at, profit)],
+                    }
+                elif episode['profits'][-1][1] != profit:
+                    episode['profits'].append((fetched_at, profit))
+    
+    # Still open when the data ran out
+    for min_profit, running in open_episodes.items():
+        for episode in running.values():
+            episode['end'] = last
+            episode['censored'] = True
+            episodes[min_profit].append(episode)
+    
+    return {'first': first, 'last': last, 'snapshots': count, 'episodes': episodes}
+
+
+def replay_task(task: Tuple) -> Dict:
+    """Worker entry point: one sport x one bookmaker set, every min_profit"""
+    files, sport, bookmakers, min_profits, total_stake = task
+    started = time.perf_counter()
+    result = find_episodes(iter_snapshots(files, sport), sport, min_profits,
+                           bookmaker_filter(bookmakers), total_stake)
+    result.update(sport=sport, bookmakers=bookmakers, seconds=time.perf_counter() - started)
+    return result
+
+
+def evaluate(result: Dict, min_profit: float, interval: float, total_stake: float) -> Dict:
+    """What polling one sport every `interval` seconds (from its first snapshot) would have caught"""
+    origin, end = result['first'], result['last']
+    caught, delays, profit_kes = 0, [], 0.0
+    
+    for episode in result['episodes'][min_profit]:
+        first_poll = origin + math.ceil((episode['start'] - origin) / interval) * interval
+        if first_poll < episode['end'] or (episode['censored'] and first_poll <= episode['end']):
+            caught += 1
+            delays.append(first_poll - episode['start'])
+            times = [t for t, _ in episode['profits']]
+            profit = episode['profits'][bisect_right(times, first_poll) - 1][1]
+            profit_kes += profit * total_stake / 100
+    
+    polls = int((end - origin) // interval) + 1 if origin is not None else 0
+    return {
+        'arbs': len(result['episodes'][min_profit]),
+        'caught': caught,
+        'delays': delays,
+        'profit_kes': profit_kes,
+        'credits': polls * len(arb.ODDS_REGIONS.split(',')) * len(arb.ODDS_MARKETS.split(',')),
+    }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(results: List[Dict], intervals: List[float], min_profits: List[float],
+              bookmaker_sets: List[str], total_stake: float) -> Dict:
+    catches, durations = [], []
+    
+    for bookmakers in bookmaker_sets:
+        sport_results = [r for r in results if r['bookmakers'] == bookmakers]
+        for min_profit in min_profits:
+            lengths = [episode['end'] - episode['start'] for r in sport_results
+                       for episode in r['episodes'][min_profit]]
+            durations.append({
+                'min_profit': min_profit, 'bookmakers': bookmakers, 'arbs': len(lengths),
+                'p50_seconds': percentile(lengths, 50), 'p90_seconds': percentile(lengths, 90),
+                'max_seconds': max(lengths, default=0.0),
+                'censored': sum(episode['censored'] for r in sport_results
+                                for episode in r['episodes'][min_profit]),
+            })
+            
+            for interval in intervals:
+                rows = [evaluate(r, min_profit, interval, total_stake) for r in sport_results]
+                arbs = sum(row['arbs'] for row in rows)
+                caught = sum(row['caught'] for row in rows)
+                catches.append({
+                    'interval': interval, 'min_profit': min_profit, 'bookmakers': bookmakers,
+                    'arbs': arbs, 'caught': caught,
+                    'catch_rate': caught / arbs if arbs else 0.0,
+                    'p50_delay_seconds': percentile([d for row in rows for d in row['delays']], 50),
+                    'credits': sum(row['credits'] for row in rows),
+                    'profit_kes': sum(row['profit_kes'] for row in rows),
+                })
+    
+    return {'catches': catches, 'durations': durations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded odds through the arbitrage scanner")
+    parser.add_argument('paths', nargs='+', help="snapshot .bin files, captured .json files or directories")
+    parser.add_argument('--interval', type=float, nargs='+', default=[arb.CHECK_INTERVAL],
+                        help="poll intervals to compare (seconds)")
+    parser.add_argument('--min-profit', type=float, nargs='+', default=[arb.MIN_PROFIT_PERCENT])
+    parser.add_argument('--bookmakers', nargs='+', default=['kenyan'],
+                        help="bookmaker sets: 'kenyan', 'all' (captured JSON only) or comma-separated keys")
+    parser.add_argument('--sports', nargs='+', help="only these sports (default: all in the data)")
+    parser.add_argument('--stake', type=float, default=arb.MAX_STAKE_KES)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--json', help="also write results to this file")
+    args = parser.parse_args()
+    
+    files = snapshot_files(args.paths)
+    if not files:
+        parser.error("no snapshot files found")
+    
+    # The recorder stores odds after the live bookmaker filter, so .bin data can't widen the set
+    if any(path.endswith('.bin') for path in files):
+        if 'all' in args.bookmakers:
+            parser.error("--bookmakers all needs captured Odds API JSON: .bin snapshots only hold the "
+                         "bookmakers the live filter kept, so 'all' would replay the same books")
+        recorded = recorded_bookmakers(files)
+        for spec in args.bookmakers:
+            if spec == 'kenyan':
+                continue
+            missing = [name for name in spec.split(',')
+                       if not any(arb.BookmakerFilter([name]).matches(key, title) for key, title in recorded)]
+            if missing:
+                print(f"⚠️  {', '.join(missing)}: not in the .bin snapshots (filtered out before recording), "
+                      f"so '{spec}' replays without them")
+    
+    sports = args.sports or dataset_sports(files)
+    print(f"📂 {len(files)} files, {len(sports)} sports, {len(args.bookmakers)} bookmaker sets")
+    
+    started = time.perf_counter()
+    tasks = [(files, sport, bookmakers, args.min_profit, args.stake)
+             for sport in sports for bookmakers in args.bookmakers]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(replay_task, tasks))
+    
+    snapshots = sum(r['snapshots'] for r in results) // len(args.bookmakers)
+    spans = [r['last'] - r['first'] for r in results if r['first'] is not None]
+    print(f"⚡ Replayed {snapshots} snapshots covering {max(spans, default=0) / 3600:.1f}h "
+          f"in {time.perf_counter() - started:.1f}s")
+    
+    summary = summarize(results, args.interval, args.min_profit, args.bookmakers, args.stake)
+    
+    print(f"\n{'interval':>8} {'min %':>6} {'bookmakers':<14} {'arbs':>6} {'caught':>7} {'rate':>6} "
+          f"{'p50 delay':>10} {'credits':>8} {'profit KES':>11}")
+    for row in summary['catches']:
+        print(f"{row['interval']:>8g} {row['min_profit']:>6g} {row['bookmakers'][:14]:<14} {row['arbs']:>6} "
+              f"{row['caught']:>7} {row['catch_rate']:>6.0%} {row['p50_delay_seconds']:>9.0f}s "
+              f"{row['credits']:>8} {row['profit_kes']:>11.2f}")
+    
+    print(f"\n{'min %':>6} {'bookmakers':<14} {'arbs':>6} {'p50 life':>9} {'p90 life':>9} {'max life':>9}")
+    for row in summary['durations']:
+        print(f"{row['min_profit']:>6g} {row['bookmakers'][:14]:<14} {row['arbs']:>6} "
+              f"{row['p50_seconds']:>8.0f}s {row['p90_seconds']:>8.0f}s {row['max_seconds']:>8.0f}s")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), **summary}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()